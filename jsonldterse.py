@@ -1,27 +1,223 @@
 # Copyright © 2025 Michael Thornburgh
 # SPDX-License-Identifier: MIT
 
-from urllib.parse import urlsplit, urljoin, urldefrag
+from urllib.parse import urlsplit, urlunsplit, urljoin, urldefrag
+import array
+import bisect
+import codecs
+import collections.abc
+import concurrent.futures
 import copy
+import decimal
+import functools
+import inspect
+import itertools
 import json
+import json.decoder
+import json.encoder
+import json.scanner
+import mmap
+import re
+import struct
+import time
+import weakref
+
+PhaseInfo = collections.namedtuple("PhaseInfo", ["calls", "seconds"])
 
 class JSONLD_Terse:
-	def __init__(self, node = None, documentUri = None, vocab = None, fallbackContext = None, maxDepth = 64):
+	_WELL_KNOWN_PREFIXES = {
+		"http://www.w3.org/1999/02/22-rdf-syntax-ns#": "rdf",
+		"http://www.w3.org/2000/01/rdf-schema#": "rdfs",
+		"http://www.w3.org/2001/XMLSchema#": "xsd",
+		"http://www.w3.org/2002/07/owl#": "owl",
+		"http://www.w3.org/ns/ldp#": "ldp",
+		"http://purl.org/dc/terms/": "dcterms",
+		"http://xmlns.com/foaf/0.1/": "foaf",
+		"https://schema.org/": "schema",
+		"http://schema.org/": "schema",
+		"http://zenomt.com/ns/terse-api#": "api"
+	}
+
+	_PHASES = {
+		"merge": ["_basicMerge", "_streamMergeNode", "_mergeFlattened"],
+		"contexts": ["_resolveContext", "_resolveLocalContext"],
+		"uris": ["_expandUriCache"],
+		"literals": ["_adaptLiteral", "_plainLiteral"],
+		"dedup": ["_addValues"],
+		"rendering": ["_basicAsTree", "_jsonPieces", "_nTriplesLines", "iterTriples"]
+	}
+
+	_N_TRIPLES_STRING_ESCAPES = str.maketrans({ "\\": "\\\\", '"': '\\"', "\n": "\\n", "\r": "\\r" })
+	_N_TRIPLES_IRI_ESCAPES = str.maketrans({ c: "\\u%04X" % ord(c) for c in list(map(chr, range(0x21))) + list('<>"{}|^`\\') })
+
+	def __init__(self, node = None, documentUri = None, vocab = None, fallbackContext = None, maxDepth = 64, cacheSize = 4096, provenance = False):
+		self._contexts = weakref.WeakValueDictionary()
+		self._resolveContextCache = functools.lru_cache(maxsize=cacheSize)(self._resolveFrozenContext)
+		self._expandUriCache = functools.lru_cache(maxsize=cacheSize)(self._expandUriInContext)
 		self._nodes = {}
 		self._uris = {}
 		self._literals = {}
+		self._nodeOrder = {}
+		self._nodeSerial = itertools.count()
+		self._listMembers = {}
+		self._subjectsByPredicate = {}
+		self._subjectsByObject = {}
+		self._subjectsByPredicateObject = {}
+		self._literalsByValue = {}
+		self._documents = {} if provenance else None
+		self._tripleDocuments = {} if provenance else None
+		self._asserting = None
 		self._root = self.get(self.merge(node, documentUri=documentUri, vocab=vocab, maxDepth=maxDepth, fallbackContext=fallbackContext) if node else None) or self._first(self._nodes.values())
 
 	def merge(self, node, documentUri=None, vocab=None, fallbackContext=None, maxDepth=64):
-		baseUri, prefixes, vocab = self._resolveContext(documentUri, vocab, fallbackContext, {})
-		return self._basicMerge(node, depth=0, visited={}, blankNodes={}, prefixes=prefixes, baseUri=baseUri, vocab=vocab, maxDepth=maxDepth, literals=self._literals)
+		context = self._internContext(*self._resolveContext(documentUri, vocab, fallbackContext, {}))
+		self._beginDocument(documentUri)
+		try:
+			return self._basicMerge(node, depth=0, visited={}, blankNodes={}, context=context, maxDepth=maxDepth, literals=self._literals)
+		finally:
+			self._asserting = None
+
+	def mergeStream(self, fp, documentUri=None, vocab=None, fallbackContext=None, maxDepth=64, chunkSize=65536):
+		"""Merge a document read incrementally from fp, a text or binary file-like object."""
+		# unlike merge, the document doesn't need to be parsed first. each element of a top-level
+		# Array, and of an Array member of a top-level node (including @included), is merged as soon
+		# as it's been read, and is then discarded.
+		reader = _JSONStreamReader(fp, chunkSize)
+		context = self._internContext(*self._resolveContext(documentUri, vocab, fallbackContext, {}))
+		ctx = dict(depth=0, visited={}, blankNodes={}, context=context, maxDepth=maxDepth, literals=self._literals)
+		self._beginDocument(documentUri)
+		try:
+			if reader.peek() == "[":
+				if maxDepth < 1:
+					raise RecursionError("nested too deep")
+				rv = []
+				for _ in reader.elements():
+					rv.append(self._basicMerge(reader.readValue(), **dict(ctx, depth=1, visited={})))
+			elif reader.peek() == "{":
+				rv = self._streamMergeNode(reader, ctx)
+			else:
+				rv = self._basicMerge(reader.readValue(), **ctx)
+		finally:
+			self._asserting = None
+		reader.end()
+		return rv
+
+	def mergeDocuments(self, documents, vocab=None, fallbackContext=None, maxDepth=64, processes=None, chunksize=1):
+		"""Merge many documents, parsing and expanding them in a pool of worker processes."""
+		# documents is an iterable of (source, documentUri) pairs, where source is JSON text (str or
+		# bytes) or an already-parsed node. the graph is the same as merging each document in turn,
+		# and the answer is the list of what merge answered for each.
+		documents = list(documents)
+		jobs = map(lambda each: (each[0], each[1], vocab, fallbackContext, maxDepth), documents)
+		with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as executor:
+			return list(map(self._mergeFlattened, executor.map(_flattenDocument, jobs, chunksize=chunksize), (documentUri for _, documentUri in documents)))
+
+	def remove(self, node, documentUri=None, vocab=None, fallbackContext=None, maxDepth=64):
+		"""Remove the triples matching those encoded by node, answering how many were removed."""
+		# as in a PATCH's @remove graph, api:any is a wildcard matching any node or literal in its
+		# position, and blank nodes and @lists in node only match by api:any. nodes and literals that
+		# are no longer in any triple are removed from the graph, except for the root.
+		patterns = JSONLD_Terse()
+		patterns.merge(node, documentUri=documentUri, vocab=vocab, fallbackContext=fallbackContext, maxDepth=maxDepth)
+		anyNode = patterns.get("http://zenomt.com/ns/terse-api#any")
+		def resolve(term):
+			# answers None for the wildcard, or a term of this graph, or False if there isn't one
+			if term is anyNode:
+				return None
+			if type(term) == list or "@list" in term:
+				return False
+			if "@value" in term:
+				return self._internedLiteral(term) or False
+			return self._uris.get(term["@id"], False) if "@id" in term else False
+		matches = {}
+		for subject in patterns.nodes:
+			s = resolve(subject)
+			for key, values in subject.items():
+				p = key if key != "http://zenomt.com/ns/terse-api#any" else None
+				if s is False or key[:1] == "@":
+					continue
+				for value in values:
+					o = resolve(value)
+					if o is not False:
+						self._matchTriples(s, p, o, matches)
+		return self._removeTriples(matches.values())
+
+	def patch(self, body, documentUri=None, vocab=None, fallbackContext=None, maxDepth=64):
+		"""Apply a PATCH body: remove its @remove graph's triples as by remove, then merge it."""
+		if body.get("@remove", None) is not None:
+			context = self.effectiveRootContext(body, documentUri=documentUri, vocab=vocab, fallbackContext=fallbackContext)
+			self.remove(body["@remove"], documentUri=documentUri, fallbackContext=context, maxDepth=maxDepth)
+		return self.merge(body, documentUri=documentUri, vocab=vocab, fallbackContext=fallbackContext, maxDepth=maxDepth)
+
+	def retract(self, documentUri):
+		"""Remove the triples merged only from documentUri, answering how many were removed."""
+		# removing values still rebuilds the subject's value list, which is O(container) for a
+		# container's members.
+		self._requireProvenance()
+		asserted = self._documents.pop(documentUri, {})
+		for key in asserted:
+			self._tripleDocuments[key].discard(documentUri)
+		return self._removeUnasserted(asserted)
+
+	def replace(self, node, documentUri=None, vocab=None, fallbackContext=None, maxDepth=64):
+		"""Merge a new version of the document at documentUri, and retract the triples it dropped."""
+		self._requireProvenance()
+		asserted = self._documents.pop(documentUri, {})
+		for key in asserted:
+			self._tripleDocuments[key].discard(documentUri)
+		rv = self.merge(node, documentUri=documentUri, vocab=vocab, fallbackContext=fallbackContext, maxDepth=maxDepth)
+		self._removeUnasserted(asserted)
+		return rv
+
+	@property
+	def documents(self):
+		"""The documentUris that contributed triples to this graph, if it was made with provenance."""
+		return [documentUri for documentUri, asserted in (self._documents or {}).items() if asserted]
+
+	def compact(self):
+		"""Answer a read-only JSONLD_TerseCompact copy of this graph."""
+		return JSONLD_TerseCompact(self)
+
+	def pager(self, root = None, predicate = "http://zenomt.com/ns/terse-api#member", pageSize = 100, pageBytes = None, pageUri = None, noArray = False, base = True, rawLiteral = False, context = None):
+		"""Answer a JSONLD_TersePager rendering pages of root's values for predicate."""
+		return JSONLD_TersePager(self, root, predicate, pageSize=pageSize, pageBytes=pageBytes, pageUri=pageUri, noArray=noArray, base=base, rawLiteral=rawLiteral, context=context)
+
+	def cacheInfo(self):
+		"""Answer the hit/miss statistics of the context resolution and URI expansion caches."""
+		caches = dict(vars(self), **{ name: original for name, original in getattr(self, "_uninstrumented", {}).items() if original is not None })
+		return dict(contexts=caches["_resolveContextCache"].cache_info(), uris=caches["_expandUriCache"].cache_info())
+
+	def instrument(self, enabled = True):
+		"""Count calls of and time in each phase of merging and rendering, or stop if not enabled."""
+		# starting resets the counts answered by phaseInfo. the phases' methods are replaced on this
+		# graph by timing wrappers while it's instrumented, so there's no overhead otherwise. phases
+		# can be within others (like literals within merge or rendering), and the time of each
+		# includes the phases within it.
+		for name, original in getattr(self, "_uninstrumented", {}).items():
+			if original is None:
+				delattr(self, name)
+			else:
+				setattr(self, name, original)
+		self._uninstrumented = {}
+		self._phaseCounts = {}
+		if not enabled:
+			return
+		for phase, names in self._PHASES.items():
+			counts = self._phaseCounts[phase] = [0, 0.0, 0]
+			for name in names:
+				self._uninstrumented[name] = self.__dict__.get(name, None)
+				setattr(self, name, self._timed(getattr(self, name), counts))
+
+	def phaseInfo(self):
+		"""Answer the calls of and seconds in each phase since instrument, or {} if not instrumented."""
+		return { phase: PhaseInfo(calls, seconds) for phase, (calls, seconds, _) in getattr(self, "_phaseCounts", {}).items() }
 
 	def get(self, uriOrNode):
 		if type(uriOrNode) == str:
 			return self._uris.get(uriOrNode, None)
+		if uriOrNode is not None and id(uriOrNode) in self._nodes:
+			return uriOrNode
 		if type(uriOrNode) == dict:
-			if id(uriOrNode) in self._nodes:
-				return uriOrNode
 			return self._uris.get(uriOrNode.get("@id", None), None)
 
 	@property
@@ -37,17 +233,10 @@ class JSONLD_Terse:
 		self._root = self.get(uriOrNode)
 
 	def asTriples(self):
-		nextBlank = 0
-		blanks = {}
-		def getId(node):
-			nonlocal nextBlank
-			rv = node.get("@id", None) or blanks.get(id(node), None)
-			if rv != None:
-				return rv
-			name = "_:b" + str(nextBlank)
-			nextBlank += 1
-			blanks[id(node)] = name
-			return name
+		return list(self.iterTriples())
+
+	def iterTriples(self):
+		getId = self._blankNamer()
 		def valueObject(node):
 			if type(node) == list:
 				return list(map(valueObject, node))
@@ -56,43 +245,140 @@ class JSONLD_Terse:
 			if "@value" in node:
 				return self._adaptLiteral(node)
 			return { "@id": getId(node) }
-		rv = []
 		for node in self.nodes:
 			subject = getId(node)
 			for predicate, values in node.items():
 				if predicate[:1] != "@":
 					for value in values:
-						rv.append(dict(subject=subject, predicate=predicate, _object=valueObject(value)))
-		return rv
+						yield dict(subject=subject, predicate=predicate, _object=valueObject(value))
+
+	def writeNTriples(self, fp, bufferSize = 65536):
+		"""Write the graph to text file-like fp as N-Triples, answering how many were written."""
+		# blank nodes are named as by asTriples. @lists are expanded to RDF Lists, whose cells are
+		# blank nodes named "_:lN".
+		buffer = []
+		size = 0
+		count = 0
+		for line in self._nTriplesLines(self._blankNamer()):
+			buffer.append(line)
+			size += len(line)
+			count += 1
+			if size >= bufferSize:
+				fp.write("".join(buffer))
+				buffer = []
+				size = 0
+		if buffer:
+			fp.write("".join(buffer))
+		return count
 
-	def asTree(self, root = None, noArray = False, base = None, rawLiteral = False):
+	def writeSnapshot(self, fp):
+		"""Write the graph to binary file-like fp in the format loaded by JSONLD_TerseSnapshot."""
+		# a snapshot is a sorted table of the graph's strings (@ids, predicates and literals' lexical
+		# forms) and fixed-width arrays of nodes, literals, lists and triples, with the triples in
+		# graph order and indexed by predicate and object, in native byte order.
+		snapshot = JSONLD_TerseSnapshot
+		nodes = list(self._nodes.values())
+		nodeIndex = { id(node): i for i, node in enumerate(nodes) }
+		strings = set(node["@id"] for node in nodes if "@id" in node)
+		literals = {}
+		lists = []
+		triples = []
+		starts = array.array("I", [0])
+		def term(value):
+			# nested at most maxDepth deep, as merged
+			if type(value) in [list, tuple] or "@list" in value:
+				index = len(lists)
+				lists.append(None)
+				lists[index] = ("@list" in value if type(value) not in [list, tuple] else False, [term(each) for each in (value["@list"] if type(value) not in [list, tuple] else value)])
+				return snapshot._LIST | index
+			if "@value" in value:
+				if id(value) not in literals:
+					literals[id(value)] = (len(literals), snapshot._literalRecord(value))
+					strings.update(each for each in literals[id(value)][1][1:] if each is not None)
+				return snapshot._LITERAL | literals[id(value)][0]
+			return nodeIndex[id(value)]
+		for i, node in enumerate(nodes):
+			for key, values in node.items():
+				if key[:1] != "@":
+					strings.add(key)
+					triples.extend((i, key, term(each)) for each in values)
+					if not values:
+						# an empty value list, which merge keeps, is a triple with no object
+						triples.append((i, key, snapshot._NONE))
+			starts.append(len(triples))
+		table = sorted(strings)
+		stringIndex = { each: i for i, each in enumerate(table) }
+		encoded = [each.encode("utf-8", "surrogatepass") for each in table]
+		offsets = array.array("Q", itertools.accumulate(map(len, encoded), initial=0))
+		nodeStrings = array.array("I", [stringIndex[node["@id"]] if "@id" in node else snapshot._NONE for node in nodes])
+		uriIndex = array.array("I", sorted((i for i, node in enumerate(nodes) if "@id" in node), key=lambda i: nodeStrings[i]))
+		literalRecords = array.array("I")
+		for _, (kind, *lexical) in literals.values():
+			literalRecords.extend([kind] + [stringIndex[each] if each is not None else snapshot._NONE for each in lexical])
+		listRecords = array.array("I")
+		listItems = array.array("I")
+		for wrapped, items in lists:
+			listRecords.extend([len(listItems), len(items), int(wrapped)])
+			listItems.extend(items)
+		tripleArray = array.array("I")
+		for subject, predicate, _object in triples:
+			tripleArray.extend([subject, stringIndex[predicate], _object])
+		byPredicate = array.array("I", sorted(range(len(triples)), key=lambda t: (tripleArray[3 * t + 1], tripleArray[3 * t + 2], t)))
+		byObject = array.array("I", sorted(range(len(triples)), key=lambda t: (tripleArray[3 * t + 2], t)))
+		root = nodeIndex.get(id(self._root), len(nodes))
+		fp.write(snapshot._HEADER.pack(snapshot._MAGIC, snapshot._BYTE_ORDER, snapshot._VERSION, len(table), len(nodes), len(uriIndex), len(literals), len(lists), len(listItems), len(triples), root, offsets[-1]))
+		for section in [offsets, b"".join(encoded), nodeStrings, uriIndex, starts, literalRecords, listRecords, listItems, tripleArray, byPredicate, byObject]:
+			data = section.tobytes() if type(section) == array.array else section
+			fp.write(data + b"\0" * (-len(data) % 8))
+
+	def asTree(self, root = None, noArray = False, base = None, rawLiteral = False, context = None):
+		"""Answer the graph as a Terse JSON-LD tree."""
+		# if context is a prefix map (like the answer of effectiveRootContext) or True for
+		# inferContext's, the tree has an @context with those prefixes and @vocab, predicates and
+		# types are written as terms, compact IRIs or @vocab-relative keys, and rdf:types are written
+		# as @type. an @base in context is ignored; use base to relativize @ids.
 		root = self.get(root) if root else self.root
-		base = self._resolveUri("", base) if base is not None else None
-		basePath = self._resolveUri(".", base) if base is not None else None
-		baseRoot = self._resolveUri("/", base) if base is not None else None
-		ctx = dict(visited={}, nextBlank=0, noArray=noArray, base=base, basePath=basePath, baseRoot=baseRoot, rawLiteral=rawLiteral)
+		ctx = self._treeContext(noArray, base, rawLiteral, context)
 		rv = self._basicAsTree(root, ctx) if root is not None else {}
 		included = []
-		for ident, node in self._nodes.items():
-			if (ident not in ctx["visited"]) and any(map(lambda k: k[:1] != "@", node.keys())):
-				included.append(self._basicAsTree(node, ctx))
+		for node in self._includedNodes(ctx["visited"]):
+			included.append(self._basicAsTree(node, ctx))
 		if len(included):
 			rv["@included"] = included
+		if ctx["compactor"] is not None and ctx["compactor"].context:
+			rv = { "@context": ctx["compactor"].context, **rv }
 		return rv
 
-	def asJSON(self, root = None, indent = None, separators = None, noArray = False, base = None, rawLiteral = False):
-		return json.dumps(self.asTree(root, noArray=noArray, base=base, rawLiteral=rawLiteral), indent=indent, separators=separators)
+	def asJSON(self, root = None, indent = None, separators = None, noArray = False, base = None, rawLiteral = False, context = None):
+		return json.dumps(self.asTree(root, noArray=noArray, base=base, rawLiteral=rawLiteral, context=context), indent=indent, separators=separators)
+
+	def writeJSON(self, fp, root = None, indent = None, separators = None, noArray = False, base = None, rawLiteral = False, context = None, bufferSize = 65536):
+		"""Write the same text as asJSON to text file-like fp, as it's rendered."""
+		# the graph is walked once to find the blank nodes that will need an @id, and then again to
+		# write the output in pieces of about bufferSize characters, so the tree isn't built.
+		buffer = []
+		size = 0
+		for piece in self._jsonPieces(self.get(root) if root else self.root, indent, separators, self._treeContext(noArray, base, rawLiteral, context)):
+			buffer.append(piece)
+			size += len(piece)
+			if size >= bufferSize:
+				fp.write("".join(buffer))
+				buffer = []
+				size = 0
+		if buffer:
+			fp.write("".join(buffer))
 
 	def select(self, s = None, p = None, o = None, literal = None, nodes = None, column = None, filter = None):
 		rv = []
 		querySubjectNode = self.get(s)
 		queryPredicateNode = self.get(p)
 		queryObjectNode = self.get(o)
-		nodes = nodes if nodes is not None else ([querySubjectNode] if s is not None else self._nodes.values())
 		literal = ({ "@value": literal } if self._isPrimitive(literal) else literal) if literal is not None else None
 		if (s is not None and querySubjectNode is None) or (p is not None and queryPredicateNode is None) or (o is not None and queryObjectNode is None):
 			return rv
 		queryPredicateUri = queryPredicateNode.get("@id", None) if queryPredicateNode is not None else None
+		if nodes is None:
+			nodes = [querySubjectNode] if s is not None else self._candidateSubjects(queryPredicateUri, queryObjectNode, literal)
 		for subject in nodes:
 			if querySubjectNode is not None and subject is not querySubjectNode:
 				continue
@@ -100,16 +386,81 @@ class JSONLD_Terse:
 				if key[:1] != "@":
 					predicate = queryPredicateNode or self.get(key)
 					for _object in values:
-						if queryObjectNode is not None and _object != queryObjectNode:
+						if queryObjectNode is not None and _object is not queryObjectNode:
+							continue
+						if literal is not None and not self._literalMatches(literal, _object):
 							continue
-						if literal is not None:
-							if ("@value" not in _object) or any(map(lambda k: (k in literal) and literal[k] != _object.get(k, None), ["@value", "@language", "@direction", "@type"])):
-								continue
 						if filter is not None and not filter(subject, predicate, _object):
 							continue
 						rv.append(dict(subject=subject, predicate=predicate, _object=_object))
 		return self._unique(map(lambda each: each.get(column, None), rv)) if column else rv
 
+	def query(self, patterns, bindings = None):
+		"""Answer an iterator of the bindings of the variables of a basic graph pattern."""
+		# patterns is a list of (s, p, o) or (s, p, o, filter) triple patterns, with a string
+		# starting with "?" as a variable. other subjects and predicates are URIs or nodes, as for
+		# select, and a blank node predicate matches nothing. an object is a URI or node, or a
+		# literal to match as for select's literal: a number, a boolean, or a dict with "@value" and
+		# optionally "@type", "@language" or "@direction". filter, if given, is called with each
+		# matching subject, predicate node and object, as for select. each binding is a dict of
+		# variables (with their "?") to nodes, predicate nodes or values, including the bindings
+		# given to start from, and is made as the iterator is advanced. the patterns are joined in
+		# the order chosen by _planQuery.
+		compiled = []
+		for pattern in patterns:
+			if len(pattern) not in [3, 4]:
+				raise ValueError(f"not a triple pattern: {pattern!r}")
+			s, p, o = (each if self._isVariable(each) else self.get(each) for each in pattern[:3])
+			literal = None
+			if type(pattern[2]) in [int, float, bool] or (type(pattern[2]) == dict and "@value" in pattern[2]):
+				o = None
+				literal = pattern[2] if type(pattern[2]) == dict else { "@value": pattern[2] }
+			if s is None or p is None or (o is None and literal is None):
+				return iter([])
+			if not self._isVariable(p) and p.get("@id", None) is None:
+				# a blank node isn't a predicate
+				return iter([])
+			compiled.append((s, p, o, literal, pattern[3] if len(pattern) > 3 else None))
+		rows = iter([dict(bindings or {})])
+		for pattern, keys in self._planQuery(compiled, set(bindings or {})):
+			rows = self._lookupJoin(pattern, rows) if keys is None else self._hashJoin(pattern, rows, keys)
+		return rows
+
+	def inferContext(self):
+		"""Answer a prefix map for compacting this graph's output with asTree's context."""
+		# namespaces (URIs up to their last "#" or "/") of predicates, types and literal datatypes
+		# that are used more than once get well-known prefixes or ones derived from their URIs.
+		counts = {}
+		def count(uri, n):
+			split = max(uri.rfind("#"), uri.rfind("/")) + 1
+			if split > 0 and split < len(uri):
+				counts[uri[:split]] = counts.get(uri[:split], 0) + n
+		for predicate, subjects in self._subjectsByPredicate.items():
+			if predicate != "http://www.w3.org/1999/02/22-rdf-syntax-ns#type":
+				count(predicate, len(subjects))
+		typed = self._subjectsByPredicate.get("http://www.w3.org/1999/02/22-rdf-syntax-ns#type", ())
+		for node in (typed.values() if type(typed) == dict else typed):
+			for each in node["http://www.w3.org/1999/02/22-rdf-syntax-ns#type"]:
+				if type(each) != list and "@id" in each:
+					count(each["@id"], 1)
+		for literal in self._literals.values():
+			if literal.get("@type", None) is not None:
+				count(literal["@type"], 1)
+		schemes = set(uri[:uri.find(":")] for uri in self._uris)
+		rv = {}
+		for namespace, n in sorted(counts.items(), key=lambda each: (-each[1], each[0])):
+			if n < 2:
+				continue
+			name = self._WELL_KNOWN_PREFIXES.get(namespace, None)
+			if name is None or name in rv:
+				name = re.sub("[^a-z0-9]", "", namespace.rstrip("#/").rsplit("/", 1)[-1].lower())[:12]
+			if not name or not name[0].isalpha() or name in rv or name in schemes:
+				name = "ns" + str(len(rv) + 1)
+			while name in rv or name in schemes:
+				name += "_"
+			rv[name] = namespace
+		return rv
+
 	@classmethod
 	def effectiveRootContext(cls, node, documentUri = None, vocab = None, fallbackContext = None):
 		baseUri, prefixes, vocab = cls._resolveContext(documentUri, vocab, fallbackContext, {})
@@ -120,87 +471,964 @@ class JSONLD_Terse:
 			prefixes["@vocab"] = vocab
 		return prefixes
 
-	def _makeRelative(self, uri, base, basePath, baseRoot, **unused):
+	def _candidateSubjects(self, predicateUri, objectNode, literal):
+		# answer the subjects that could match from the most selective index, in graph order
+		candidates = self._candidateIndex(predicateUri, objectNode, literal)
+		if predicateUri is None and objectNode is None and (literal is None or "@value" not in literal):
+			return candidates
+		return sorted(candidates, key=lambda each: self._nodeOrder[id(each)])
+
+	def _candidateIndex(self, predicateUri, objectNode, literal):
+		# answer the subjects that could match from the most selective index, in any order
+		candidates = []
+		if predicateUri is not None:
+			candidates.append(self._subjectsByPredicate.get(predicateUri, {}))
+		if objectNode is not None:
+			candidates.append(self._objectSubjects(predicateUri, objectNode))
+		if literal is not None and "@value" in literal:
+			subjects = {}
+			for each in self._bucketItems(self._literalsByValue.get(self._valueKey(literal["@value"]), None)).values():
+				subjects.update(self._objectSubjects(predicateUri, each))
+			candidates.append(subjects)
+		if not candidates:
+			return self._nodes.values()
+		return min(candidates, key=len).values()
+
+	def _patternStatistics(self, predicateUri, objectNode, literal):
+		# estimate the numbers of triples, subjects and objects that match from the size of the
+		# most selective index, and the values of a sample of its subjects
+		subjects = self._candidateIndex(predicateUri, objectNode, literal)
+		if objectNode is not None or literal is not None:
+			return len(subjects), len(subjects), 1
+		sample = list(itertools.islice(subjects, 16))
+		values = [each.get(predicateUri, ()) if predicateUri is not None else [v for k, vs in each.items() if k[:1] != "@" for v in vs] for each in sample]
+		triples = len(subjects) * sum(map(len, values)) / max(1, len(sample))
+		objects = list(itertools.islice(itertools.chain.from_iterable(values), 64))
+		return triples, len(subjects), triples * len(set(map(id, objects))) / max(1, len(objects))
+
+	def _planQuery(self, patterns, bound):
+		# answer [(pattern, join variables)] in the order to join them. the join variables are None
+		# if the pattern is to be matched with the indexes for each binding instead of hash joined.
+		rv = []
+		rows = 1
+		remaining = []
+		for pattern in patterns:
+			s, p, o, literal, _ = pattern
+			if self._isVariable(s):
+				triples, subjects, objects = self._patternStatistics(None if self._isVariable(p) else p["@id"], None if self._isVariable(o) else o, literal)
+			else:
+				triples = objects = sum(len(values) for key, values in ([(p["@id"], s.get(p["@id"], ()))] if not self._isVariable(p) else s.items()) if key[:1] != "@")
+				subjects = 1
+			remaining.append((pattern, triples, triples / max(1, subjects), triples / max(1, objects)))
+		while remaining:
+			choices = []
+			for i, (pattern, triples, perSubject, perObject) in enumerate(remaining):
+				s, p, o, literal, _ = pattern
+				variables = set(each for each in (s, p, o) if self._isVariable(each))
+				subjectBound = s in bound if self._isVariable(s) else True
+				objectBound = (o in bound if self._isVariable(o) else True) if literal is None else True
+				if subjectBound and objectBound:
+					matches = cost = 1 if self._isVariable(o) else min(1, perSubject)
+				elif subjectBound:
+					matches = cost = perSubject
+				elif objectBound and self._isVariable(o):
+					matches = cost = perObject
+				else:
+					matches = cost = triples
+				keys = None
+				if variables & bound and rows * cost > triples + rows:
+					keys = tuple(sorted(variables & bound))
+					cost = (triples + rows) / rows
+				connected = bool(variables & bound) or not variables or not bound
+				choices.append((not connected, rows * matches, cost, i, keys))
+			_, estimate, _, i, keys = min(choices)
+			pattern = remaining.pop(i)[0]
+			rv.append((pattern, keys))
+			rows = max(1, estimate)
+			bound.update(each for each in pattern[:3] if self._isVariable(each))
+		return rv
+
+	def _lookupJoin(self, pattern, rows):
+		for row in rows:
+			yield from self._matchPattern(pattern, row)
+
+	def _hashJoin(self, pattern, rows, keys):
+		table = None
+		for row in rows:
+			if table is None:
+				table = {}
+				for binding in self._matchPattern(pattern, {}):
+					table.setdefault(tuple(id(binding[key]) for key in keys), []).append(binding)
+			for binding in table.get(tuple(id(row[key]) for key in keys), ()):
+				yield { **row, **binding }
+
+	def _matchPattern(self, pattern, row):
+		# the bindings extending row with each match of pattern, using the indexes for its bound
+		# terms. the constants have been looked up, so the terms that are strings are variables.
+		s, p, o, literal, test = pattern
+		subject = row.get(s, None) if type(s) == str else s
+		predicate = row.get(p, None) if type(p) == str else p
+		_object = row.get(o, None) if type(o) == str else o
+		if (subject is not None and (type(subject) == list or "@value" in subject or "@list" in subject)) or (predicate is not None and predicate.get("@id", None) is None):
+			return
+		predicateUri = predicate["@id"] if predicate is not None else None
+		free = [(i, name) for i, name in enumerate((s, p, o)) if type(name) == str and name not in row]
+		if subject is not None:
+			candidates = (subject,)
+		elif _object is not None and type(_object) != list and "@list" not in _object:
+			candidates = self._candidateIndex(predicateUri, None, _object) if "@value" in _object else self._candidateIndex(predicateUri, _object, None)
+		else:
+			candidates = self._candidateIndex(predicateUri, None, literal)
+		for candidate in candidates:
+			if predicate is not None and _object is not None:
+				found = [(predicate["@id"], (_object,) if self._hasTriple(candidate, predicateUri, _object) else ())]
+			elif predicate is not None:
+				found = [(predicateUri, candidate.get(predicateUri, ()))]
+			else:
+				found = candidate.items()
+			for key, values in found:
+				if key[:1] == "@":
+					continue
+				keyNode = predicate or self.get(key)
+				for each in values:
+					if _object is not None and each is not _object:
+						continue
+					if literal is not None and not self._literalMatches(literal, each):
+						continue
+					if test is not None and not test(candidate, keyNode, each):
+						continue
+					if not free:
+						yield row
+						continue
+					binding = dict(row)
+					match = (candidate, keyNode, each)
+					for i, name in free:
+						# a variable can be repeated, as in (?x, p, ?x)
+						if binding.setdefault(name, match[i]) is not match[i]:
+							break
+					else:
+						yield binding
+
+	@staticmethod
+	def _isVariable(term):
+		return type(term) == str and term[:1] == "?"
+
+	@staticmethod
+	def _literalMatches(literal, _object):
+		return type(_object) != list and "@value" in _object and not any(map(lambda k: (k in literal) and literal[k] != _object.get(k, None), ["@value", "@language", "@direction", "@type"]))
+
+	def _hasTriple(self, subject, predicateUri, _object):
+		if type(_object) == list or "@list" in _object:
+			return any(each is _object for each in subject.get(predicateUri, ()))
+		return self._bucketHas(self._subjectsByPredicateObject.get((predicateUri, id(_object)), None), subject)
+
+	def _addNode(self, node):
+		ident = id(node)
+		if ident not in self._nodes:
+			self._nodes[ident] = node
+			self._nodeOrder[ident] = next(self._nodeSerial)
+
+	def _indexTriple(self, subject, predicate, _object):
+		self._subjectsByPredicate.setdefault(predicate, {})[id(subject)] = subject
+		if type(_object) != dict or "@list" in _object:
+			# lists aren't indexed by object, but nodes in them mustn't be removed by _collectNodes
+			self._countListMembers(_object, 1)
+			return
+		if "@value" in _object:
+			self._bucketAdd(self._literalsByValue, self._valueKey(_object["@value"]), _object)
+		ident = id(_object)
+		self._bucketAdd(self._subjectsByObject, ident, subject)
+		self._bucketAdd(self._subjectsByPredicateObject, (predicate, ident), subject)
+
+	def _indexValues(self, subject, predicate, values):
+		# _indexTriple for each of values, with subject's entry in the predicate index set once
+		self._subjectsByPredicate.setdefault(predicate, {})[id(subject)] = subject
+		bucketAdd, subjectsByObject, subjectsByPredicateObject = self._bucketAdd, self._subjectsByObject, self._subjectsByPredicateObject
+		for each in values:
+			if type(each) != dict or "@list" in each:
+				self._countListMembers(each, 1)
+				continue
+			if "@value" in each:
+				bucketAdd(self._literalsByValue, self._valueKey(each["@value"]), each)
+			ident = id(each)
+			bucketAdd(subjectsByObject, ident, subject)
+			bucketAdd(subjectsByPredicateObject, (predicate, ident), subject)
+
+	# the object and literal indexes answer a single node or literal as itself, and more than one
+	# as a _Bucket by id. most are in only one triple, and a dict for each would triple the memory
+	# per triple.
+
+	@staticmethod
+	def _bucketAdd(index, key, value):
+		bucket = index.get(key, None)
+		if bucket is None:
+			index[key] = value
+		elif type(bucket) == _Bucket:
+			bucket[id(value)] = value
+		elif bucket is not value:
+			index[key] = _Bucket(((id(bucket), bucket), (id(value), value)))
+
+	@staticmethod
+	def _bucketDiscard(index, key, value):
+		bucket = index.get(key, None)
+		if bucket is value:
+			del index[key]
+		elif type(bucket) == _Bucket:
+			bucket.pop(id(value), None)
+			if len(bucket) == 1:
+				index[key] = next(iter(bucket.values()))
+
+	@staticmethod
+	def _bucketHas(bucket, value):
+		return bucket is value or (type(bucket) == _Bucket and id(value) in bucket)
+
+	@staticmethod
+	def _bucketItems(bucket):
+		# the members of bucket, which may be None, by id
+		return bucket if type(bucket) == _Bucket else {} if bucket is None else { id(bucket): bucket }
+
+	def _objectSubjects(self, predicateUri, _object):
+		# the subjects with _object as a value, of predicateUri if it's not None, by id
+		return self._bucketItems(self._subjectsByPredicateObject.get((predicateUri, id(_object)), None) if predicateUri is not None else self._subjectsByObject.get(id(_object), None))
+
+	def _internedLiteral(self, literal):
+		return self._literals.get(self._internKey(literal), None)
+
+	@classmethod
+	def _internKey(cls, literal):
+		# literal's key in _literals, as made by _adaptLiteral
+		valueKey = cls._literalKey(literal["@value"], literal.get("@type", None), literal.get("@language", None), literal.get("@direction", None))
+		try:
+			hash(valueKey)
+			return valueKey
+		except TypeError:
+			return json.dumps([valueKey[1], literal.get("@type", None), literal.get("@language", None), literal.get("@direction", None)])
+
+	def _matchTriples(self, s, p, o, matches):
+		# add the triples matching the pattern (s, p, o), with None for wildcards, to matches as
+		# (subject, predicate, { id(object) }), keyed by (id(subject), predicate)
+		if s is not None:
+			subjects = [s]
+		elif o is not None:
+			subjects = self._objectSubjects(p, o).values()
+		else:
+			subjects = self._subjectsByPredicate.get(p, {}).values() if p is not None else self._nodes.values()
+		for subject in subjects:
+			for predicate in ([p] if p is not None else [key for key in subject.keys() if key[:1] != "@"]):
+				if predicate not in subject:
+					continue
+				if o is None:
+					matches.setdefault((id(subject), predicate), (subject, predicate, set()))[2].update(map(id, subject[predicate]))
+				elif self._bucketHas(self._subjectsByPredicateObject.get((predicate, id(o)), None), subject):
+					matches.setdefault((id(subject), predicate), (subject, predicate, set()))[2].add(id(o))
+
+	def _removeTriples(self, matches):
+		count = 0
+		candidates = {}
+		for subject, predicate, ids in matches:
+			values = subject[predicate]
+			removed = [each for each in values if id(each) in ids]
+			values[:] = [each for each in values if id(each) not in ids]
+			if not values:
+				del subject[predicate]
+			stack = []
+			for each in removed:
+				self._unindexTriple(subject, predicate, each)
+				stack.append(each)
+				if self._tripleDocuments is not None:
+					for document in self._tripleDocuments.pop((id(subject), predicate, id(each)), ()):
+						self._documents[document].pop((id(subject), predicate, id(each)), None)
+			while stack:
+				each = stack.pop()
+				if type(each) == list or "@list" in each:
+					stack.extend(each if type(each) == list else each["@list"])
+				else:
+					candidates[id(each)] = each
+			candidates[id(subject)] = subject
+			if predicate not in self._subjectsByPredicate and predicate in self._uris:
+				candidates[id(self._uris[predicate])] = self._uris[predicate]
+			count += len(removed)
+		self._collectNodes(candidates)
+		return count
+
+	def _unindexTriple(self, subject, predicate, _object):
+		def discard(index, key, ident):
+			bucket = index.get(key, {})
+			bucket.pop(ident, None)
+			if not bucket:
+				index.pop(key, None)
+		if predicate not in subject:
+			discard(self._subjectsByPredicate, predicate, id(subject))
+		if type(_object) != dict or "@list" in _object:
+			self._countListMembers(_object, -1)
+			return
+		self._bucketDiscard(self._subjectsByPredicateObject, (predicate, id(_object)), subject)
+		if any(map(lambda key: self._bucketHas(self._subjectsByPredicateObject.get((key, id(_object)), None), subject), subject.keys())):
+			return
+		self._bucketDiscard(self._subjectsByObject, id(_object), subject)
+		if "@value" in _object and id(_object) not in self._subjectsByObject:
+			self._bucketDiscard(self._literalsByValue, self._valueKey(_object["@value"]), _object)
+
+	def _countListMembers(self, value, n):
+		# count each node and literal in the list value (and its nested lists) n more times in
+		# _listMembers
+		stack = [value]
+		while stack:
+			value = stack.pop()
+			for each in (value if type(value) == list else value["@list"]):
+				if type(each) == list or "@list" in each:
+					stack.append(each)
+				else:
+					count = self._listMembers.get(id(each), 0) + n
+					if count:
+						self._listMembers[id(each)] = count
+					else:
+						del self._listMembers[id(each)]
+
+	def _collectNodes(self, candidates):
+		# remove the candidate nodes and literals that aren't in any triple or list any more, except
+		# the root
+		candidates = { ident: node for ident, node in candidates.items() if node is not self._root and ident not in self._subjectsByObject
+			and ident not in self._listMembers and ("@value" in node or (ident in self._nodes and not any(map(lambda key: key[:1] != "@", node.keys()))
+			and node.get("@id", None) not in self._subjectsByPredicate)) }
+		for ident, node in candidates.items():
+			if "@value" in node:
+				if self._internedLiteral(node) is node:
+					del self._literals[self._internKey(node)]
+				continue
+			del self._nodes[ident]
+			del self._nodeOrder[ident]
+			if "@id" in node and self._uris.get(node["@id"], None) is node:
+				del self._uris[node["@id"]]
+
+	def _nTriplesLines(self, getId):
+		RDF = "http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+		cells = itertools.count()
+		newCell = lambda: "_:l" + str(next(cells))
+		def term(node):
+			if "@value" in node:
+				return self._nTriplesLiteral(node)
+			return "<" + self._nTriplesIri(node["@id"]) + ">" if "@id" in node else getId(node)
+		def statements(subject, predicate, value):
+			if type(value) == list:
+				for each in value:
+					yield from statements(subject, predicate, each)
+			elif "@list" in value:
+				cell = newCell() if value["@list"] else "<" + RDF + "nil>"
+				yield f"{subject} {predicate} {cell} .\n"
+				for index, each in enumerate(value["@list"]):
+					yield from statements(cell, "<" + RDF + "first>", { "@list": each } if type(each) == list else each)
+					rest = newCell() if index + 1 < len(value["@list"]) else "<" + RDF + "nil>"
+					yield f"{cell} <{RDF}rest> {rest} .\n"
+					cell = rest
+			else:
+				yield f"{subject} {predicate} {term(value)} .\n"
+		predicates = {}
+		for node in self.nodes:
+			subject = term(node)
+			for predicate, values in node.items():
+				if predicate[:1] != "@":
+					predicate = predicates.get(predicate) or predicates.setdefault(predicate, "<" + self._nTriplesIri(predicate) + ">")
+					for value in values:
+						if type(value) != list and "@list" not in value:
+							yield f"{subject} {predicate} {term(value)} .\n"
+						else:
+							yield from statements(subject, predicate, value)
+
+	@classmethod
+	def _nTriplesLiteral(cls, node):
+		XSD = "http://www.w3.org/2001/XMLSchema#"
+		RDF_JSON = "http://www.w3.org/1999/02/22-rdf-syntax-ns#JSON"
+		value = node["@value"]
+		datatype = node.get("@type", None)
+		if datatype == RDF_JSON or not (cls._isPrimitive(value) and value is not None):
+			lexical = json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+			datatype = datatype or RDF_JSON
+		elif type(value) == str:
+			lexical = value
+		elif type(value) == bool:
+			lexical = "true" if value else "false"
+			datatype = datatype or XSD + "boolean"
+		elif type(value) == int or (type(value) == float and value.is_integer() and abs(value) < 1e21):
+			lexical = str(int(value))
+			datatype = datatype or XSD + "integer"
+		else:
+			lexical = cls._canonicalDouble(value)
+			datatype = datatype or XSD + "double"
+		rv = '"' + lexical.translate(cls._N_TRIPLES_STRING_ESCAPES) + '"'
+		if "@direction" in node:
+			return rv + "^^<https://www.w3.org/ns/i18n#" + (node.get("@language", None) or "") + "_" + str(node["@direction"]) + ">"
+		if "@language" in node:
+			return rv + "@" + str(node["@language"])
+		return rv + ("^^<" + cls._nTriplesIri(datatype) + ">" if datatype and datatype != XSD + "string" else "")
+
+	@classmethod
+	def _nTriplesIri(cls, uri):
+		return uri.translate(cls._N_TRIPLES_IRI_ESCAPES)
+
+	@staticmethod
+	def _canonicalDouble(value):
+		if value != value:
+			return "NaN"
+		if value in [float("inf"), float("-inf")]:
+			return "INF" if value > 0 else "-INF"
+		sign, digits, exponent = decimal.Decimal(repr(value)).normalize().as_tuple()
+		fraction = "".join(map(str, digits[1:])) or "0"
+		return ("-" if sign else "") + str(digits[0]) + "." + fraction + "E" + str(len(digits) + exponent - 1)
+
+	@staticmethod
+	def _blankNamer():
+		blanks = {}
+		def getId(node):
+			rv = node.get("@id", None) or blanks.get(id(node), None)
+			if rv != None:
+				return rv
+			name = "_:b" + str(len(blanks))
+			blanks[id(node)] = name
+			return name
+		return getId
+
+	def _flatten(self, root):
+		# a picklable form of this graph, with nodes referenced by their position in _nodes, and
+		# literals by ~ their position in a table of them with their keys in _literals
+		positions = { ident: position for position, ident in enumerate(self._nodes) }
+		literals = list(self._literals.items())
+		positions.update((id(literal), ~position) for position, (_, literal) in enumerate(literals))
+		def encode(value):
+			if type(value) == list:
+				return list(map(encode, value))
+			if "@list" in value:
+				return { "@list": list(map(encode, value["@list"])) }
+			return positions[id(value)]
+		nodes = [(node.get("@id", None), [(key, list(map(encode, values))) for key, values in node.items() if key[:1] != "@"]) for node in self._nodes.values()]
+		return literals, nodes, encode(root)
+
+	def _mergeFlattened(self, flattened, documentUri = None):
+		self._beginDocument(documentUri)
+		try:
+			return self._mergeFlattenedDocument(*flattened)
+		finally:
+			self._asserting = None
+
+	def _mergeFlattenedDocument(self, literals, nodes, root):
+		# the literals are already interned by key, and each node's values for a predicate are unique
+		literals = [self._literals.setdefault(key, literal) for key, literal in literals]
+		merged = []
+		def decode(value):
+			if type(value) == int:
+				return merged[value] if value >= 0 else literals[~value]
+			if type(value) == list:
+				return list(map(decode, value))
+			return { "@list": list(map(decode, value["@list"])) }
+		for uri, _ in nodes:
+			node = {} if uri is None else self._uris.get(uri, None) or { "@id": uri }
+			if uri is not None:
+				self._uris[uri] = node
+			self._addNode(node)
+			merged.append(node)
+		for node, (_, properties) in zip(merged, nodes):
+			for key, values in properties:
+				self._addValues(node, key, list(map(decode, values)), unique=key not in node)
+		return decode(root)
+
+	def _makeRelative(self, uri, base, basePath, baseRoot, baseSplit = None, **unused):
 		if not base:
 			return uri
 		uri_split = urlsplit(uri)
-		base_split = urlsplit(base)
+		base_split = baseSplit or urlsplit(base)
 		if uri_split.scheme != base_split.scheme or uri_split.netloc != base_split.netloc:
 			return uri
-		if urldefrag(uri)[0] == base:
+		if (uri.partition("#")[0] if "#" in uri else uri) == base:
 			return ("#" if uri_split.fragment or uri[-1:] == "#" else "") + uri_split.fragment
-		if self._resolveUri(".", uri).startswith(basePath):
-			return uri[len(basePath):] or "."
+		path = uri_split.path
+		# the same as _resolveUri(".", uri) unless there are dot segments to remove
+		directory = uri_split.scheme + "://" + uri_split.netloc + path[:path.rfind("/") + 1] if path[:1] == "/" and "/." not in path else self._resolveUri(".", uri)
+		if directory.startswith(basePath):
+			rv = uri[len(basePath):]
+			# "#x", "?x" and "x:y" would be read relative to the base document or as absolute
+			return "./" + rv if rv[:1] in ["#", "?"] or ":" in rv.split("/", 1)[0] else rv or "."
 		return uri[len(baseRoot) - 1:]
 
-	def _basicAsTree(self, node, ctx):
-		if type(node) == list:
-			return self._basicAsTree(node[0], ctx) if len(node) == 1 and ctx["noArray"] else list(map(lambda v: self._basicAsTree(v, ctx), node))
-		if "@list" in node:
-			return { "@list": list(map(lambda v: self._basicAsTree(v, ctx), node["@list"])) }
-		if "@value" in node:
-			return self._adaptLiteral(node, rawLiteral=ctx["rawLiteral"])
-		item = ctx["visited"].get(id(node))
-		if item is not None:
-			if "@id" not in item:
-				item["@id"] = "_:b" + str(ctx["nextBlank"])
-				ctx["nextBlank"] += 1
-			return { "@id": item["@id"] }
+	def _renderId(self, uri, ctx):
+		compactor = ctx["compactor"]
+		rv = self._makeRelative(uri, **ctx)
+		if compactor is None:
+			return rv
+		# a relative reference that could be read as a term can't be used
+		if rv == uri or rv in compactor.prefixes:
+			return compactor.iri(uri)
+		return rv
+
+	def _treeContext(self, noArray, base, rawLiteral, context = None):
+		base = self._resolveUri("", base) if base is not None else None
+		basePath = self._resolveUri(".", base) if base is not None else None
+		baseRoot = self._resolveUri("/", base) if base is not None else None
+		baseSplit = urlsplit(base) if base else None
+		compactor = _Compactor(self.inferContext() if context is True else context) if context else None
+		return dict(visited={}, nextBlank=0, noArray=noArray, base=base, basePath=basePath, baseRoot=baseRoot, baseSplit=baseSplit, rawLiteral=rawLiteral, compactor=compactor)
+
+	def _compactTypes(self, key, values, compactor):
+		# with a compactor, rdf:types that are all named nodes are written as @type
+		if compactor is None or key != "http://www.w3.org/1999/02/22-rdf-syntax-ns#type" or any(map(lambda each: type(each) == list or "@id" not in each, values)):
+			return None
+		return [compactor.key(each["@id"]) for each in values]
+
+	def _includedNodes(self, visited):
+		# checked lazily, since rendering each one can visit more
+		for ident, node in self._nodes.items():
+			if (ident not in visited) and any(map(lambda k: k[:1] != "@", node.keys())):
+				yield node
+
+	def _treeBlankIds(self, root, compactor = None):
+		# the @ids that asTree gives blank nodes that are referenced again, in the order they're
+		# referenced again, each with the index of the member of its node being rendered then
+		# (the @id precedes that member) or None if the node had been rendered (the @id is last).
+		# the root's @included member has index len(root).
+		visited = set()
+		rendering = {}
 		rv = {}
-		ctx["visited"][id(node)] = rv
-		for key, value in node.items():
-			rv[key] = self._makeRelative(value, **ctx) if key == "@id" else self._basicAsTree(value, ctx)
+		included = object()
+		root = root if root is not None else {}
+		visited.add(id(root))
+		stack = [(itertools.chain(enumerate(root.items()), [(len(root), (included, None))]), root)]
+		while stack:
+			items, node = stack[-1]
+			for value in items:
+				if node is not None:
+					rendering[id(node)], (key, value) = value
+					if key is included:
+						stack.append((self._includedNodes(visited), None))
+						break
+					if key == "@id" or self._compactTypes(key, value, compactor) is not None:
+						continue
+				if type(value) in [list, tuple]:
+					stack.append((iter(value), None))
+					break
+				if "@list" in value:
+					stack.append((iter(value["@list"]), None))
+					break
+				if "@value" in value:
+					continue
+				if id(value) in visited:
+					if id(value) not in rv and "@id" not in value:
+						rv[id(value)] = ("_:b" + str(len(rv)), rendering.get(id(value), None))
+					continue
+				visited.add(id(value))
+				stack.append((enumerate(value.items()), value))
+				break
+			else:
+				stack.pop()
+				if node is not None:
+					rendering.pop(id(node), None)
 		return rv
 
-	def _basicMerge(self, node, depth, visited, blankNodes, prefixes, baseUri, vocab, maxDepth, literals):
-		depth += 1
-		if depth > maxDepth:
-			raise RecursionError("nested too deep")
+	def _jsonPieces(self, root, indent, separators, ctx):
+		# the same walk as _treeBlankIds, writing asJSON's text instead. a frame is [items, level,
+		# first, node, @id position, text after the closing bracket]; node is None for arrays.
+		compactor = ctx["compactor"]
+		names = self._treeBlankIds(root, compactor)
+		ids = { ident: name for ident, (name, _) in names.items() }
+		indent = " " * indent if type(indent) == int else indent
+		itemSeparator, keySeparator = separators or ((",", ": ") if indent is not None else (", ", ": "))
+		encode = json.JSONEncoder(indent=indent, separators=(itemSeparator, keySeparator)).encode
+		encodeString = json.encoder.encode_basestring_ascii
+		newline = (lambda level: "") if indent is None else (lambda level: "\n" + indent * level)
+		keys = {}
+		idKey = encode("@id") + keySeparator
+		listKey = encode("@list") + keySeparator
+		valueKey = encode("@value") + keySeparator
+		typeKey = encode("@type") + keySeparator
+		noArray = ctx["noArray"]
+		rawLiteral = ctx["rawLiteral"]
+		visited = set()
+		included = object()
+		root = root if root is not None else {}
+		visited.add(id(root))
+		out = ["{"]
+		write = out.append
+		stack = [[itertools.chain(enumerate(root.items()), [(len(root), (included, None))]), 1, True, root, names.get(id(root), (None, None))[1], ""]]
+		if compactor is not None and compactor.context:
+			write(newline(1) + encode("@context") + keySeparator + encode(compactor.context).replace("\n", newline(1)))
+			stack[0][2] = False
+		while stack:
+			if len(out) >= 1024:
+				yield "".join(out)
+				out.clear()
+			frame = stack[-1]
+			items, level, first, node, position, suffix = frame
+			for value in items:
+				if node is not None:
+					index, (key, value) = value
+					if index == position:
+						write(("" if first else itemSeparator) + newline(level) + idKey + encodeString(ids[id(node)]))
+						first = frame[2] = False
+					if key is included:
+						value = self._first(self._includedNodes(visited))
+						if value is None:
+							continue
+						write(("" if first else itemSeparator) + newline(level) + encode("@included") + keySeparator + "[")
+						first = frame[2] = False
+						stack.append([itertools.chain([value], self._includedNodes(visited)), level + 1, True, None, None, ""])
+						break
+					if key == "@id":
+						ids[id(node)] = self._renderId(value, ctx)
+						write(("" if first else itemSeparator) + newline(level) + idKey + encodeString(ids[id(node)]))
+						first = frame[2] = False
+						continue
+					types = self._compactTypes(key, value, compactor)
+					if types is not None:
+						text = encode(types[0] if noArray and len(types) == 1 else types)
+						write(("" if first else itemSeparator) + newline(level) + typeKey + (text if indent is None else text.replace("\n", newline(level))))
+						first = frame[2] = False
+						continue
+					if key not in keys:
+						keys[key] = encode(compactor.key(key) if compactor is not None else key) + keySeparator
+					write(("" if first else itemSeparator) + newline(level) + keys[key])
+				else:
+					write(("" if first else itemSeparator) + newline(level))
+				first = frame[2] = False
 
-		baseUri, prefixes, vocab = self._resolveContext(baseUri, vocab, node.get("@context", None) if type(node) == dict else None, prefixes)
-		ctx = dict(depth=depth, visited=visited, blankNodes=blankNodes, prefixes=prefixes, baseUri=baseUri, vocab=vocab, maxDepth=maxDepth, literals=literals)
-
-		if type(node) == list:
-			return list(map(lambda v: self._basicMerge(v, **ctx), node))
-		if self._isPrimitive(node):
-			return self._adaptLiteral({"@value": node}, **ctx)
-		if "@list" in node:
-			return { "@list": list(map(lambda v: self._basicMerge(v, **ctx), node["@list"])) if type(node["@list"]) == list else [] }
-		if "@value" in node:
-			return self._adaptLiteral(node, **ctx)
-		if id(node) in visited:
-			return visited[id(node)]
-
-		uri = self._expandUri(node.get("@id", None), False, **ctx)
+				while noArray and type(value) in [list, tuple] and len(value) == 1:
+					value = value[0]
+				if type(value) in [list, tuple]:
+					if not value:
+						write("[]")
+						continue
+					write("[")
+					stack.append([iter(value), level + 1, True, None, None, ""])
+					break
+				if "@list" in value:
+					if not value["@list"]:
+						write("{" + newline(level + 1) + listKey + "[]" + newline(level) + "}")
+						continue
+					write("{" + newline(level + 1) + listKey + "[")
+					stack.append([iter(value["@list"]), level + 2, True, None, None, newline(level) + "}"])
+					break
+				if "@value" in value:
+					if len(value) == 1 and type(value["@value"]) == str:
+						text = encodeString(value["@value"])
+						write(text if rawLiteral else "{" + newline(level + 1) + valueKey + text + newline(level) + "}")
+						continue
+					literal = self._adaptLiteral(value, rawLiteral=rawLiteral)
+					if compactor is not None and type(literal) == dict and "@type" in literal:
+						literal["@type"] = compactor.datatype(literal["@type"])
+					text = encode(literal)
+					write(text if indent is None else text.replace("\n", newline(level)))
+					continue
+				if id(value) in visited:
+					write("{" + newline(level + 1) + idKey + encodeString(ids[id(value)]) + newline(level) + "}")
+					continue
+				visited.add(id(value))
+				write("{")
+				stack.append([enumerate(value.items()), level + 1, True, value, names.get(id(value), (None, None))[1], ""])
+				break
+			else:
+				stack.pop()
+				if node is not None and position is None and id(node) in names:
+					write(("" if first else itemSeparator) + newline(level) + idKey + encodeString(ids[id(node)]))
+					first = False
+				write(("" if first else newline(level - 1)) + ("]" if node is None else "}") + suffix)
+		yield "".join(out)
+
+	def _basicAsTree(self, node, ctx):
+		# a "values" frame renders each value onto a list, a "members" frame renders each member of a
+		# node, and a "set" frame assigns a rendered container to its member once the container's
+		# contents have been rendered, so members are added in the same order as a depth-first
+		# recursive rendering (including late blank node @ids).
+		visited = ctx["visited"]
+		noArray = ctx["noArray"]
+		rawLiteral = ctx["rawLiteral"]
+		compactor = ctx["compactor"]
+		rv = []
+		stack = [("values", iter((node,)), rv, None)]
+		while stack:
+			kind, items, target, result = stack[-1]
+			if kind == "set":
+				stack.pop()
+				target[items] = result
+				continue
+			for value in items:
+				key = None
+				if kind == "members":
+					key, value = value
+					if key == "@id":
+						target[key] = self._renderId(value, ctx)
+						continue
+					if compactor is not None:
+						types = self._compactTypes(key, value, compactor)
+						if types is not None:
+							target["@type"] = types[0] if noArray and len(types) == 1 else types
+							continue
+						key = compactor.key(key)
+				while noArray and type(value) in [list, tuple] and len(value) == 1:
+					value = value[0]
+				child = None
+				if type(value) in [list, tuple]:
+					result = []
+					child = ("values", iter(value), result, None)
+				elif "@list" in value:
+					result = { "@list": [] }
+					child = ("values", iter(value["@list"]), result["@list"], None)
+				elif "@value" in value:
+					result = self._adaptLiteral(value, rawLiteral=rawLiteral)
+					if compactor is not None and type(result) == dict and "@type" in result:
+						result["@type"] = compactor.datatype(result["@type"])
+				elif id(value) in visited:
+					item = visited[id(value)]
+					if "@id" not in item:
+						item["@id"] = "_:b" + str(ctx["nextBlank"])
+						ctx["nextBlank"] += 1
+					result = { "@id": item["@id"] }
+				else:
+					result = {}
+					visited[id(value)] = result
+					child = ("members", iter(value.items()), result, None)
+				if key is None:
+					target.append(result)
+				elif child is None:
+					target[key] = result
+				else:
+					stack.append(("set", key, target, result))
+				if child is not None:
+					stack.append(child)
+					break
+			else:
+				stack.pop()
+		return rv[0]
+
+	def _basicMerge(self, node, depth, visited, blankNodes, context, maxDepth, literals):
+		# this and the other walks of documents and graphs use an explicit stack rather than
+		# recursion, so deep documents are limited only by maxDepth and not by the interpreter's
+		# recursion limit. a "values" frame merges each value onto a list, a "members" frame merges
+		# each member of a node, and an "add" frame adds a member's merged values to its node once
+		# they've all been merged, in the same order as a depth-first recursive merge.
+		rv = []
+		stack = [("values", iter((node,)), rv, context, depth + 1)]
+		while stack:
+			kind, items, target, context, depth = stack[-1]
+			if kind == "add":
+				stack.pop()
+				self._addValues(items, target, context)
+				continue
+			for value in items:
+				if kind == "members":
+					key, value = value
+					if key == "@type":
+						self._mergeTypes(target, value, context, blankNodes)
+					elif key == "@included":
+						stack.append(("values", iter((value,)), [], context, depth + 1))
+						break
+					elif key[:1] != "@":
+						predicate = self._expandUriCache(key, True, context)
+						if predicate:
+							self._addPredicate(predicate)
+							merged = []
+							stack.append(("add", target, predicate, merged, None))
+							stack.append(("values", iter(value if type(value) == list else (value,)), merged, context, depth + 1))
+							break
+					continue
+
+				if depth > maxDepth:
+					raise RecursionError("nested too deep")
+				valueContext = self._resolveLocalContext(context, value["@context"]) if type(value) == dict and "@context" in value else context
+
+				if type(value) == list:
+					merged = []
+					target.append(merged)
+					stack.append(("values", iter(value), merged, valueContext, depth + 1))
+					break
+				elif self._isPrimitive(value):
+					target.append(self._plainLiteral(value, literals))
+				elif "@list" in value:
+					target.append({ "@list": [] })
+					if type(value["@list"]) == list:
+						stack.append(("values", iter(value["@list"]), target[-1]["@list"], valueContext, depth + 1))
+						break
+				elif id(value) in visited:
+					target.append(visited[id(value)])
+				elif "@value" in value:
+					target.append(self._adaptLiteral(value, literals=literals, typeUri=self._expandId(value.get("@type", None), valueContext)))
+					visited[id(value)] = target[-1]
+				else:
+					subject = self._mergeSubject(self._expandId(value.get("@id", None), valueContext), blankNodes)
+					visited[id(value)] = subject
+					target.append(subject)
+					stack.append(("members", iter(value.items()), subject, valueContext, depth))
+					break
+			else:
+				stack.pop()
+
+		return rv[0]
+
+	def _mergeSubject(self, uri, blankNodes):
 		isBlank = (type(uri) != str) or uri[:2] == "_:"
 		rv = blankNodes.get(uri, {}) if isBlank else self._uris.get(uri, {})
 		if not isBlank:
 			rv["@id"] = uri
 		elif uri:
 			blankNodes[uri] = rv
-		self._nodes[id(rv)] = rv
+		self._addNode(rv)
 		if not isBlank:
 			self._uris[uri] = rv
-		visited[id(node)] = rv
-
-		for key, value in node.items():
-			if key == "@type":
-				key = "http://www.w3.org/1999/02/22-rdf-syntax-ns#type"
-				value = list(map(lambda v: { "@id": self._expandUri(v, isKey = bool(vocab), **ctx) }, value if type(value) == list else [value]))
-
-			if key == "@included":
-				self._basicMerge(value, **ctx)
-			elif key[:1] != "@":
-				key = self._expandUri(key, True, **ctx)
-				if key:
-					if key not in self._uris:
-						keyNode = { "@id": key }
-						self._uris[key] = keyNode
-						self._nodes[id(keyNode)] = keyNode
-					rv[key] = self._unique(rv.get(key, []) + list(map(lambda v: self._basicMerge(v, **ctx), value if type(value) == list else [value])))
+		return rv
+
+	def _mergeMember(self, rv, key, value, ctx):
+		if key == "@type":
+			self._mergeTypes(rv, value, ctx["context"], ctx["blankNodes"])
+		elif key == "@included":
+			self._basicMerge(value, **ctx)
+		elif key[:1] != "@":
+			self._mergeValues(rv, self._expandUriCache(key, True, ctx["context"]), value if type(value) == list else [value], ctx)
+
+	def _mergeTypes(self, rv, value, context, blankNodes):
+		# types are merged directly by URI, rather than as temporary { "@id" } nodes whose ids could
+		# be reused in visited
+		isKey = bool(context.vocab)
+		types = list(map(lambda v: self._expandId(v, context, isKey), value if type(value) == list else [value]))
+		self._addPredicate("http://www.w3.org/1999/02/22-rdf-syntax-ns#type")
+		self._addValues(rv, "http://www.w3.org/1999/02/22-rdf-syntax-ns#type", [self._mergeSubject(uri, blankNodes) for uri in types])
+
+	def _mergeValues(self, rv, key, values, ctx):
+		if key:
+			self._addPredicate(key)
+			self._addValues(rv, key, [self._basicMerge(v, **ctx) for v in values])
+
+	def _addPredicate(self, key):
+		if key not in self._uris:
+			keyNode = { "@id": key }
+			self._uris[key] = keyNode
+			self._addNode(keyNode)
 
+	def _addValues(self, rv, key, merged, unique = False):
+		# the (predicate, object) index already answers whether rv has a value, so values are appended
+		# in place. @list objects and nested lists are always new, so they're never duplicates, and
+		# there are none if the merged values are unique and rv has none for key.
+		values = rv.setdefault(key, [])
+		subjectsByPredicateObject = self._subjectsByPredicateObject
+		asserting = self._asserting
+		if unique and asserting is None:
+			values.extend(merged)
+			self._indexValues(rv, key, merged)
+			return
+		for each in merged:
+			if not unique and type(each) == dict and "@list" not in each and self._bucketHas(subjectsByPredicateObject.get((key, id(each)), None), rv):
+				if asserting is not None:
+					self._assertTriple(rv, key, each)
+				continue
+			values.append(each)
+			self._indexTriple(rv, key, each)
+			if asserting is not None:
+				# a new triple can't have been asserted before
+				triple = (id(rv), key, id(each))
+				asserting[triple] = (rv, key, each)
+				self._tripleDocuments[triple] = { self._assertingDocument }
+
+	def _beginDocument(self, documentUri):
+		# with provenance, the triples merged until _asserting is reset are recorded as documentUri's
+		if self._documents is not None:
+			self._asserting = self._documents.setdefault(documentUri, {})
+			self._assertingDocument = documentUri
+
+	def _assertTriple(self, subject, predicate, _object):
+		triple = (id(subject), predicate, id(_object))
+		if triple not in self._asserting:
+			self._asserting[triple] = (subject, predicate, _object)
+			self._tripleDocuments.setdefault(triple, set()).add(self._assertingDocument)
+
+	def _requireProvenance(self):
+		if self._documents is None:
+			raise TypeError("graph doesn't have provenance")
+
+	def _removeUnasserted(self, asserted):
+		# remove the triples in asserted that no document asserts any more
+		matches = {}
+		for key, (subject, predicate, _object) in asserted.items():
+			if not self._tripleDocuments.get(key, True):
+				matches.setdefault((id(subject), predicate), (subject, predicate, set()))[2].add(id(_object))
+		return self._removeTriples(matches.values())
+
+	def _streamMergeNode(self, reader, ctx):
+		# the top-level object of a streamed document. its members are merged as they're read, and
+		# the elements of array members are read and merged one at a time, so the document is
+		# never held in memory all at once. keywords are held until the first other member, so an
+		# object with @value or @list is merged as merge would, but that and @context and @id can't
+		# be applied retroactively, so they must precede the members that they affect.
+		outer = ctx
+		ctx = dict(ctx, depth=ctx["depth"] + 1)
+		if ctx["depth"] > ctx["maxDepth"]:
+			raise RecursionError("nested too deep")
+		head = {}
+		rv = None
+		members = reader.members()
+		for key in members:
+			if key in ["@value", "@list"]:
+				if rv is not None:
+					raise ValueError(f"{key} must precede other node members in a streamed document")
+				head[key] = reader.readValue()
+				for key in members:
+					head[key] = reader.readValue()
+				return self._basicMerge(head, **outer)
+			if key in ["@context", "@id"] and rv is not None:
+				raise ValueError(f"{key} must precede other node members in a streamed document")
+			if key != "@included" and key[:1] == "@" and (rv is None or key != "@type"):
+				head[key] = reader.readValue()
+				if key == "@context":
+					ctx["context"] = self._resolveLocalContext(ctx["context"], head[key])
+				continue
+			if rv is None:
+				rv = self._streamMergeSubject(head, ctx)
+			if reader.peek() != "[" or key == "@type":
+				self._mergeMember(rv, key, reader.readValue(), dict(ctx, visited={}))
+			elif key == "@included":
+				for _ in reader.elements():
+					self._basicMerge(reader.readValue(), **dict(ctx, depth=ctx["depth"] + 1, visited={}))
+			else:
+				# as in merge, the values are added once they've all been merged
+				predicate = self._expandUriCache(key, True, ctx["context"])
+				if predicate:
+					self._addPredicate(predicate)
+				merged = []
+				for _ in reader.elements():
+					value = reader.readValue()
+					if predicate:
+						merged.append(self._basicMerge(value, **dict(ctx, visited={})))
+				if predicate:
+					self._addValues(rv, predicate, merged)
+		return rv if rv is not None else self._streamMergeSubject(head, ctx)
+
+	def _streamMergeSubject(self, head, ctx):
+		rv = self._mergeSubject(self._expandId(head.get("@id", None), ctx["context"]), ctx["blankNodes"])
+		if "@type" in head:
+			self._mergeTypes(rv, head["@type"], ctx["context"], ctx["blankNodes"])
 		return rv
 
+	def _internContext(self, baseUri, prefixes, vocab):
+		key = (baseUri, vocab, tuple(sorted(prefixes.items())))
+		rv = self._contexts.get(key, None)
+		if rv is None:
+			rv = _Context(baseUri, prefixes, vocab)
+			self._contexts[key] = rv
+		return rv
+
+	def _resolveLocalContext(self, context, local):
+		if local is None:
+			return context
+		try:
+			# prefixes that aren't strings are treated as null by _overlayPrefixes
+			frozen = tuple((key, value if type(value) == str or key[:1] == "@" else None) for key, value in local.items())
+			return self._resolveContextCache(context, frozen)
+		except (AttributeError, TypeError):
+			return self._internContext(*self._resolveContext(context.baseUri, context.vocab, local, context.prefixes))
+
+	def _resolveFrozenContext(self, context, frozen):
+		return self._internContext(*self._resolveContext(context.baseUri, context.vocab, dict(frozen), context.prefixes))
+
+	def _expandId(self, uri, context, isKey = False):
+		return self._expandUriCache(uri, isKey, context) if type(uri) == str else None
+
+	def _expandUriInContext(self, uri, isKey, context):
+		return self._expandUri(uri, isKey, prefixes=context.prefixes, vocab=context.vocab, baseUri=context.baseUri)
+
 	@staticmethod
 	def _resolveUri(uri, baseUri):
 		if uri is not None and not baseUri:
@@ -241,23 +1469,57 @@ class JSONLD_Terse:
 		return prefix if (prefix := prefixes.get(uri, None)) else ((vocab + uri if vocab else None) if isKey else cls._resolveUri(uri, baseUri))
 
 	@classmethod
-	def _adaptLiteral(cls, node, prefixes = None, baseUri = None, literals = None, rawLiteral = False, **unused):
-		prefixes = prefixes or {}
-		if rawLiteral and all(map(lambda key : key not in node, ["@type", "@language", "@direction"])) and cls._isPrimitive(node["@value"]):
-			return copy.deepcopy(node["@value"])
+	def _adaptLiteral(cls, node, prefixes = None, baseUri = None, literals = None, rawLiteral = False, typeUri = None, **unused):
+		value = node["@value"]
+		if len(node) == 1 and type(value) not in (dict, list):
+			return value if rawLiteral else cls._plainLiteral(value, literals)
+		if rawLiteral and all(map(lambda key : key not in node, ["@type", "@language", "@direction"])) and cls._isPrimitive(value):
+			return value
+		_type = typeUri or (cls._expandUri(node["@type"], False, prefixes=prefixes or {}, baseUri=baseUri) if type(node.get("@type", None)) == str else None)
+		language = node.get("@language", None)
+		direction = node.get("@direction", None)
+		if literals is not None:
+			valueKey = cls._literalKey(value, _type, language, direction)
+			try:
+				rv = literals.get(valueKey, None)
+			except TypeError:
+				# a malformed @language or @direction
+				valueKey = json.dumps([valueKey[1], _type, language, direction])
+				rv = literals.get(valueKey, None)
+			if rv is not None:
+				return rv
 		rv = {}
 		for key in ["@value", "@language", "@direction"]:
 			if key in node:
-				rv[key] = copy.deepcopy(node[key])
-		if type(node.get("@type", None)) == str:
-			rv["@type"] = cls._expandUri(node["@type"], False, prefixes=prefixes, baseUri=baseUri)
+				rv[key] = node[key] if cls._isPrimitive(node[key]) else copy.deepcopy(node[key])
+		if _type is not None:
+			rv["@type"] = _type
 		if literals is not None:
-			valueKey = json.dumps([rv["@value"], rv.get("@type", None), rv.get("@language", None)])
-			if valueKey in literals:
-				return literals.get(valueKey)
 			literals[valueKey] = rv
 		return rv
 
+	@classmethod
+	def _plainLiteral(cls, value, literals):
+		if literals is None:
+			return { "@value": value }
+		key = (type(value), repr(value) if type(value) == float else value, None, None, None)
+		rv = literals.get(key, None)
+		if rv is None:
+			rv = literals[key] = { "@value": value }
+		return rv
+
+	@staticmethod
+	def _literalKey(value, _type = None, language = None, direction = None):
+		# floats are keyed by repr so -0.0 and NaN stay distinct and findable, and the value's type
+		# is part of the key so 1, 1.0 and true are distinct literals
+		if type(value) == float:
+			valueKey = repr(value)
+		elif type(value) in (dict, list):
+			valueKey = json.dumps(value, sort_keys=True)
+		else:
+			valueKey = value
+		return (type(value), valueKey, _type, language, direction)
+
 	@staticmethod
 	def _isPrimitive(value):
 		return type(value) not in [dict, list]
@@ -279,7 +1541,805 @@ class JSONLD_Terse:
 				rv.append(each)
 		return rv
 
+	@staticmethod
+	def _valueKey(value):
+		try:
+			hash(value)
+			return value
+		except TypeError:
+			return json.dumps(value, sort_keys=True)
+
+	@staticmethod
+	def _timed(function, counts):
+		# counts is [calls, seconds, depth]; calls within a call of the same phase aren't counted again
+		def timed(*args, **kwargs):
+			if counts[2]:
+				return function(*args, **kwargs)
+			counts[0] += 1
+			counts[2] = 1
+			start = time.perf_counter()
+			try:
+				return function(*args, **kwargs)
+			finally:
+				counts[1] += time.perf_counter() - start
+				counts[2] = 0
+		def timedGenerator(*args, **kwargs):
+			if counts[2]:
+				yield from function(*args, **kwargs)
+				return
+			counts[0] += 1
+			items = function(*args, **kwargs)
+			while True:
+				counts[2] = 1
+				start = time.perf_counter()
+				try:
+					item = next(items)
+				except StopIteration:
+					return
+				finally:
+					counts[1] += time.perf_counter() - start
+					counts[2] = 0
+				yield item
+		return timedGenerator if inspect.isgeneratorfunction(function) else timed
+
 	@staticmethod
 	def _first(iterable):
 		for i in iterable:
 			return i
+
+class JSONLD_TerseCompact(JSONLD_Terse):
+	"""A read-only graph using a compact representation."""
+
+	# nodes and literals are slotted objects that support the read-only dict operations used on
+	# JSONLD_Terse nodes. nodes with the same predicates share one interned tuple of keys, a
+	# predicate's values are a single value or a tuple, and literals are interned by _internKey.
+
+	def __init__(self, graph):
+		super().__init__()
+		literals = {}
+		nodes = {}
+		shapes = {}
+		def convert(value):
+			if type(value) == list:
+				return list(map(convert, value))
+			if "@list" in value:
+				return { "@list": list(map(convert, value["@list"])) }
+			if "@value" in value:
+				literal = literals.get(id(value), None)
+				if literal is None:
+					literal = _CompactLiteral(value)
+					literal = self._literals.setdefault(self._internKey(literal), literal)
+					literals[id(value)] = literal
+				return literal
+			return nodes[id(value)]
+		for order, (ident, node) in enumerate(graph._nodes.items()):
+			nodes[ident] = _CompactNode(node.get("@id", None), order)
+		for ident, node in graph._nodes.items():
+			rv = nodes[ident]
+			keys = tuple(key for key in node.keys() if key[:1] != "@")
+			rv._shape = shapes.setdefault(keys, keys)
+			rv._values = tuple(convert(node[key][0]) if len(node[key]) == 1 else tuple(map(convert, node[key])) for key in keys)
+			self._nodes[id(rv)] = rv
+			if rv._id is not None:
+				self._uris[rv._id] = rv
+		self._buildIndexes()
+		self._root = nodes.get(id(graph._root), None)
+
+	def merge(self, *args, **kwargs):
+		raise TypeError("compact graphs are read-only")
+
+	mergeStream = mergeDocuments = remove = patch = retract = replace = merge
+
+	def _buildIndexes(self):
+		subjectsByPredicate = {}
+		subjectsByObject = {}
+		literalsByValue = {}
+		for subject in self._nodes.values():
+			for key, values in subject.items():
+				if key[:1] != "@":
+					subjectsByPredicate.setdefault(key, []).append(subject)
+					for each in values:
+						if type(each) != list and "@list" not in each:
+							subjects = subjectsByObject.setdefault(id(each), [])
+							if not subjects or subjects[-1] is not subject:
+								subjects.append(subject)
+		for literal in self._literals.values():
+			literalsByValue.setdefault(self._valueKey(literal.value), []).append(literal)
+		self._subjectsByPredicate = { key: tuple(value) for key, value in subjectsByPredicate.items() }
+		self._subjectsByObject = { key: tuple(value) for key, value in subjectsByObject.items() }
+		self._literalsByValue = { key: tuple(value) for key, value in literalsByValue.items() }
+
+	def _candidateSubjects(self, predicateUri, objectNode, literal):
+		return self._candidateIndex(predicateUri, objectNode, literal)
+
+	def _hasTriple(self, subject, predicateUri, _object):
+		return any(each is _object for each in subject.get(predicateUri, ()))
+
+	def _candidateIndex(self, predicateUri, objectNode, literal):
+		# the candidates are in graph order anyway
+		candidates = []
+		if predicateUri is not None:
+			candidates.append(self._subjectsByPredicate.get(predicateUri, ()))
+		if objectNode is not None:
+			candidates.append(self._subjectsByObject.get(id(objectNode), ()))
+		if literal is not None and "@value" in literal:
+			subjects = {}
+			for each in self._literalsByValue.get(self._valueKey(literal["@value"]), ()):
+				subjects.update((id(subject), subject) for subject in self._subjectsByObject.get(id(each), ()))
+			candidates.append(sorted(subjects.values(), key=lambda each: each._order))
+		return min(candidates, key=len) if candidates else self._nodes.values()
+
+class JSONLD_TerseSnapshot(JSONLD_TerseCompact):
+	"""A read-only graph loaded lazily from a file made by writeSnapshot. Call close when done."""
+
+	# the file is memory-mapped, and its nodes and literals are only made (as for
+	# JSONLD_TerseCompact) when they're reached by get, select, rendering or iterating the graph,
+	# so loading takes the same time at any size. @ids and predicates are found by binary search
+	# of the sorted string table, and select uses the snapshot's predicate and object indexes (the
+	# first select by literal maps literal values to literals).
+
+	_MAGIC = b"JLDTERSE"
+	_VERSION = 1
+	_JSON_ATTRIBUTE = 8
+	_BYTE_ORDER = 0x01020304
+	_HEADER = struct.Struct("=8sII9Q")
+	_NONE = 0xFFFFFFFF
+	_LITERAL = 1 << 30
+	_LIST = 2 << 30
+	_INDEX = (1 << 30) - 1
+
+	def __init__(self, path):
+		JSONLD_Terse.__init__(self)
+		with open(path, "rb") as f:
+			self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+		magic, byteOrder, version, strings, nodes, uris, literals, lists, listItems, triples, root, stringBytes = self._HEADER.unpack_from(self._mmap)
+		if magic != self._MAGIC or version != self._VERSION:
+			raise ValueError(f"{path} is not a JSONLD_Terse snapshot")
+		if byteOrder != self._BYTE_ORDER:
+			raise ValueError(f"{path} was written with a different byte order")
+		view = memoryview(self._mmap)
+		position = self._HEADER.size
+		sections = []
+		for size, cast in [(8 * (strings + 1), "Q"), (stringBytes, None), (4 * nodes, "I"), (4 * uris, "I"), (4 * (nodes + 1), "I"), (20 * literals, "I"), (12 * lists, "I"), (4 * listItems, "I"), (12 * triples, "I"), (4 * triples, "I"), (4 * triples, "I")]:
+			sections.append(view[position:position + size].cast(cast) if cast else view[position:position + size])
+			position += size + (-size % 8)
+		self._views = [view] + sections
+		self._stringOffsets, self._stringData, self._nodeStrings, self._uriIndex, self._starts, self._literalRecords, self._listRecords, self._listItems, self._triples, self._byPredicate, self._byObject = sections
+		self._stringCount = strings
+		self._nodeCache = {}
+		self._nodesById = {}
+		self._shapes = {}
+		self._literalCache = {}
+		self._nodes = _SnapshotNodes(self)
+		self._uris = _SnapshotUris(self)
+		self._literals = _SnapshotLiterals(self)
+		self._subjectsByPredicate = _SnapshotPredicates(self)
+		self._literalsByValue = None
+		self._root = self._node(root) if root < nodes else None
+
+	def close(self):
+		"""Release the memory-mapped file. The graph's nodes can't be used after this."""
+		for each in reversed(self._views):
+			each.release()
+		self._views = []
+		self._mmap.close()
+
+	@classmethod
+	def _literalRecord(cls, literal):
+		# (kind, lexical form, @type, @language, @direction) of a literal in a snapshot. an
+		# attribute that isn't a string is stored as JSON, with a _JSON_ATTRIBUTE bit set in kind.
+		value = literal["@value"]
+		if type(value) == str:
+			kind, lexical = 0, value
+		elif type(value) == bool:
+			kind, lexical = 3, "true" if value else "false"
+		elif type(value) == int:
+			kind, lexical = 1, str(value)
+		elif type(value) == float:
+			kind, lexical = 2, repr(value)
+		else:
+			kind, lexical = 4, json.dumps(value)
+		attributes = [literal.get(each, None) for each in ["@type", "@language", "@direction"]]
+		for i, each in enumerate(attributes):
+			if each is not None and type(each) != str:
+				kind |= cls._JSON_ATTRIBUTE << i
+				attributes[i] = json.dumps(each)
+		return (kind, lexical, *attributes)
+
+	def _string(self, index):
+		return str(self._stringData[self._stringOffsets[index]:self._stringOffsets[index + 1]], "utf-8", "surrogatepass")
+
+	def _stringIndex(self, s):
+		index = bisect.bisect_left(range(self._stringCount), s, key=self._string)
+		return index if index < self._stringCount and self._string(index) == s else None
+
+	def _node(self, index):
+		node = self._nodeCache.get(index, None)
+		if node is None:
+			ident = self._nodeStrings[index]
+			node = self._nodeCache[index] = _SnapshotNode(self, self._string(ident) if ident != self._NONE else None, index)
+			self._nodesById[id(node)] = node
+		return node
+
+	def _literal(self, index):
+		literal = self._literalCache.get(index, None)
+		if literal is None:
+			kind = self._literalRecords[5 * index]
+			_type, language, direction = [(json.loads if kind & (self._JSON_ATTRIBUTE << i) else str)(self._string(each)) if each != self._NONE else None for i, each in enumerate(self._literalRecords[5 * index + 2:5 * index + 5])]
+			literal = self._literalCache[index] = _CompactLiteral({ "@value": self._literalValue(index), "@type": _type, "@language": language, "@direction": direction })
+		return literal
+
+	def _literalValue(self, index):
+		lexical = self._string(self._literalRecords[5 * index + 1])
+		return [str, int, float, lambda each: each == "true", json.loads][self._literalRecords[5 * index] % self._JSON_ATTRIBUTE](lexical)
+
+	def _term(self, term):
+		if term & self._LIST:
+			start, count, wrapped = self._listRecords[3 * (term & self._INDEX):3 * (term & self._INDEX) + 3]
+			items = [self._term(each) for each in self._listItems[start:start + count]]
+			return { "@list": items } if wrapped else items
+		if term & self._LITERAL:
+			return self._literal(term & self._INDEX)
+		return self._node(term)
+
+	def _loadNode(self, node):
+		# fill in a node's predicates and values from its triples, like JSONLD_TerseCompact's
+		shape = []
+		values = []
+		triples = self._triples
+		for t in range(self._starts[node._order], self._starts[node._order + 1]):
+			if not shape or triples[3 * t + 1] != shape[-1]:
+				shape.append(triples[3 * t + 1])
+				values.append([])
+			if triples[3 * t + 2] != self._NONE:
+				values[-1].append(self._term(triples[3 * t + 2]))
+		shape = tuple(shape)
+		if shape not in self._shapes:
+			self._shapes[shape] = tuple(map(self._string, shape))
+		node._shape = self._shapes[shape]
+		node._values = tuple(each[0] if len(each) == 1 else tuple(each) for each in values)
+
+	def _predicateRange(self, predicateIndex, term = None):
+		key = (lambda t: self._triples[3 * t + 1]) if term is None else (lambda t: (self._triples[3 * t + 1], self._triples[3 * t + 2]))
+		target = predicateIndex if term is None else (predicateIndex, term)
+		return bisect.bisect_left(self._byPredicate, target, key=key), bisect.bisect_right(self._byPredicate, target, key=key)
+
+	def _objectRange(self, term):
+		key = lambda t: self._triples[3 * t + 2]
+		return bisect.bisect_left(self._byObject, term, key=key), bisect.bisect_right(self._byObject, term, key=key)
+
+	def _termRange(self, predicateIndex, term):
+		# the index and range of the triples with object term, and predicate predicateIndex unless None
+		if predicateIndex is None:
+			return (self._byObject,) + self._objectRange(term)
+		return (self._byPredicate,) + self._predicateRange(predicateIndex, term)
+
+	def _candidateIndex(self, predicateUri, objectNode, literal):
+		ranges = self._candidateRanges(predicateUri, objectNode, literal)
+		if ranges is None:
+			return self._nodes.values()
+		subjects = set()
+		for index, lo, hi in ranges:
+			subjects.update(self._triples[3 * t] for t in index[lo:hi])
+		return [self._node(each) for each in sorted(subjects)]
+
+	def _patternStatistics(self, predicateUri, objectNode, literal):
+		# the subjects are estimated from a sample of the triples, so that no nodes are made
+		ranges = self._candidateRanges(predicateUri, objectNode, literal)
+		if ranges is None:
+			return len(self._triples) // 3, len(self._starts) - 1, len(self._triples) // 3
+		triples = sum(hi - lo for _, lo, hi in ranges)
+		sample = [t for index, lo, hi in ranges for t in index[lo:min(hi, lo + 64)]][:64]
+		subjects = len(set(self._triples[3 * t] for t in sample))
+		objects = len(set(self._triples[3 * t + 2] for t in sample)) if objectNode is None and literal is None else 0
+		return triples, triples * subjects / max(1, len(sample)), max(1, triples * objects / max(1, len(sample)))
+
+	def _candidateRanges(self, predicateUri, objectNode, literal):
+		# the ranges of triples in the indexes are compared before making any nodes. answers
+		# None if any node could match.
+		candidates = []
+		predicateIndex = self._stringIndex(predicateUri) if predicateUri is not None else None
+		if predicateUri is not None and predicateIndex is None:
+			return []
+		if predicateUri is not None:
+			candidates.append([(self._byPredicate,) + self._predicateRange(predicateIndex)])
+		if objectNode is not None:
+			candidates.append([self._termRange(predicateIndex, objectNode._order)])
+		if literal is not None and "@value" in literal:
+			if self._literalsByValue is None:
+				self._literalsByValue = {}
+				for index in range(len(self._literalRecords) // 5):
+					self._literalsByValue.setdefault(self._valueKey(self._literalValue(index)), []).append(index)
+			candidates.append([self._termRange(predicateIndex, self._LITERAL | index) for index in self._literalsByValue.get(self._valueKey(literal["@value"]), [])])
+		if not candidates:
+			return None
+		return min(candidates, key=lambda ranges: sum(hi - lo for _, lo, hi in ranges))
+
+class JSONLD_TersePager:
+	"""Pages (per api.md) of a node with too many values of a paging predicate for one response."""
+
+	# each page is rendered like asTree from the root, with a slice of the paging predicate's values
+	# and an @metadata graph of api:Page links. the root's other triples are repeated in every page
+	# if no blank node is reachable from them (so merging the pages doesn't duplicate nodes), and
+	# otherwise are only in the first page. the values are divided into pages once, pageSize at a
+	# time or as many as fit in about pageBytes characters of JSON, so the pages are of the graph as
+	# it was when the pager was made. pageUri(k) answers page k's URI, by default the root's for the
+	# first page, and for the Nth "pageN" relative to it if it ends in "/", and otherwise it with
+	# "page=N" added to its query. if base is True, each page's @ids are relative to its URI. the
+	# other options are as for asTree.
+
+	def __init__(self, graph, root = None, predicate = "http://zenomt.com/ns/terse-api#member", pageSize = 100, pageBytes = None, pageUri = None, noArray = False, base = True, rawLiteral = False, context = None):
+		self._graph = graph
+		self._root = graph.get(root) if root else graph.root
+		if self._root is None or "@id" not in self._root:
+			raise ValueError("the root of a paged resource must be a named node")
+		self._predicate = predicate
+		self._uri = self._root["@id"]
+		self._pageUri = pageUri or self._defaultPageUri
+		self._noArray = noArray
+		self._base = base
+		self._rawLiteral = rawLiteral
+		self._compactor = _Compactor(graph.inferContext() if context is True else context) if context else None
+		self._members = list(self._root.get(predicate, ()))
+		self._shared = { key: [each for each in values if self._repeatable(each)] for key, values in self._root.items() if key[:1] != "@" and key != predicate }
+		self._offsets = self._pageOffsets(pageSize, pageBytes)
+
+	def __len__(self):
+		return len(self._offsets) - 1
+
+	def pageUri(self, k):
+		return self._pageUri(k)
+
+	def page(self, k):
+		"""Answer page k (counting from 0) as a Terse JSON-LD tree."""
+		if not 0 <= k < len(self):
+			raise IndexError("page index out of range")
+		API = "http://zenomt.com/ns/terse-api#"
+		uri = self.pageUri(k)
+		ctx = self._renderContext(uri)
+		view = {}
+		for key, values in self._root.items():
+			if key == self._predicate:
+				members = self._members[self._offsets[k]:self._offsets[k + 1]]
+				if members:
+					view[key] = members
+			elif key[:1] == "@" or k == 0:
+				view[key] = values
+			elif self._shared[key]:
+				view[key] = self._shared[key]
+		pageOf = { "@id": self._uri, API + "firstPage": [{ "@id": self.pageUri(0) }], API + "lastPage": [{ "@id": self.pageUri(len(self) - 1) }] }
+		metadata = { "@id": uri, "http://www.w3.org/1999/02/22-rdf-syntax-ns#type": [{ "@id": API + "Page" }], API + "pageOf": [pageOf] }
+		if k > 0:
+			metadata[API + "prevPage"] = [{ "@id": self.pageUri(k - 1) }]
+		if k < len(self) - 1:
+			metadata[API + "nextPage"] = [{ "@id": self.pageUri(k + 1) }]
+		metadata = self._graph._basicAsTree(metadata, ctx)
+		rv = { "@metadata": metadata, **self._graph._basicAsTree(view, ctx) }
+		if self._compactor is not None and self._compactor.context:
+			rv = { "@context": self._compactor.context, **rv }
+		return rv
+
+	def pageJSON(self, k, indent = None, separators = None):
+		return json.dumps(self.page(k), indent=indent, separators=separators)
+
+	def _defaultPageUri(self, k):
+		# "pageN" relative to a URI not ending in "/" would be its sibling, and collide with its
+		# siblings' pages. the query goes before any fragment, so each page is its own document.
+		if k == 0:
+			return self._uri
+		if self._uri.endswith("/"):
+			return self._graph._resolveUri(f"page{k + 1}", self._uri)
+		split = urlsplit(self._uri)
+		return urlunsplit(split._replace(query=(split.query + "&" if split.query else "") + f"page={k + 1}"))
+
+	def _renderContext(self, uri):
+		# references back to the root are rendered as its @id, rather than rendering it again
+		ctx = self._graph._treeContext(self._noArray, uri if self._base is True else self._base, self._rawLiteral)
+		ctx["compactor"] = self._compactor
+		ctx["visited"][id(self._root)] = { "@id": self._graph._renderId(self._uri, ctx) }
+		return ctx
+
+	def _pageOffsets(self, pageSize, pageBytes):
+		# the index in _members of the first value of each page, and then len(_members)
+		if pageBytes is None:
+			return list(range(0, len(self._members), max(1, pageSize))) + [len(self._members)] if self._members else [0, 0]
+		rv = [0]
+		size = 0
+		for index, member in enumerate(self._members):
+			memberSize = len(json.dumps(self._graph._basicAsTree(member, self._renderContext(self._uri)))) + 2
+			if size and size + memberSize > pageBytes:
+				rv.append(index)
+				size = 0
+			size += memberSize
+		return rv + [len(self._members)] if self._members else [0, 0]
+
+	def _repeatable(self, value):
+		# whether no blank nodes are reachable from value, not counting through the root
+		visited = set([id(self._root)])
+		stack = [value]
+		while stack:
+			value = stack.pop()
+			if type(value) in [list, tuple]:
+				stack.extend(value)
+			elif "@list" in value:
+				stack.extend(value["@list"])
+			elif "@value" not in value and id(value) not in visited:
+				if "@id" not in value:
+					return False
+				visited.add(id(value))
+				stack.extend(each for key, each in value.items() if key[:1] != "@")
+		return True
+
+class _Bucket(dict):
+	# the nodes or literals of an index entry with more than one, by id
+	__slots__ = ()
+
+class _CompactNode:
+	__slots__ = ("_id", "_order", "_shape", "_values")
+
+	def __init__(self, ident, order):
+		self._id = ident
+		self._order = order
+		self._shape = ()
+		self._values = ()
+
+	def __getitem__(self, key):
+		if key == "@id" and self._id is not None:
+			return self._id
+		try:
+			value = self._values[self._shape.index(key)]
+		except ValueError:
+			raise KeyError(key) from None
+		return value if type(value) == tuple else (value,)
+
+	def get(self, key, default = None):
+		try:
+			return self[key]
+		except KeyError:
+			return default
+
+	def __contains__(self, key):
+		return (key == "@id" and self._id is not None) or key in self._shape
+
+	def keys(self):
+		return (["@id"] if self._id is not None else []) + list(self._shape)
+
+	def items(self):
+		return [(key, self[key]) for key in self.keys()]
+
+	def values(self):
+		return [self[key] for key in self.keys()]
+
+	def __iter__(self):
+		return iter(self.keys())
+
+	def __len__(self):
+		return len(self._shape) + (self._id is not None)
+
+class _CompactLiteral:
+	__slots__ = ("value", "type", "language", "direction")
+
+	_KEYS = { "@value": "value", "@type": "type", "@language": "language", "@direction": "direction" }
+
+	def __init__(self, literal):
+		self.value = literal["@value"]
+		self.type = literal.get("@type", None)
+		self.language = literal.get("@language", None)
+		self.direction = literal.get("@direction", None)
+
+	def __getitem__(self, key):
+		if key not in self:
+			raise KeyError(key)
+		return getattr(self, self._KEYS[key])
+
+	def get(self, key, default = None):
+		return self[key] if key in self else default
+
+	def __contains__(self, key):
+		return key == "@value" or (key in self._KEYS and getattr(self, self._KEYS[key]) is not None)
+
+	def keys(self):
+		return [key for key in self._KEYS if key in self]
+
+	def items(self):
+		return [(key, self[key]) for key in self.keys()]
+
+	def __iter__(self):
+		return iter(self.keys())
+
+	def __len__(self):
+		return len(self.keys())
+
+class _SnapshotNode(_CompactNode):
+	# a JSONLD_TerseSnapshot node, whose predicates and values are loaded when first used
+	__slots__ = ("_snapshot",)
+
+	def __init__(self, snapshot, ident, order):
+		self._snapshot = snapshot
+		self._id = ident
+		self._order = order
+
+	def __getattr__(self, name):
+		if name not in ["_shape", "_values"]:
+			raise AttributeError(name)
+		self._snapshot._loadNode(self)
+		return getattr(self, name)
+
+class _SnapshotNodes(collections.abc.Mapping):
+	# a JSONLD_TerseSnapshot's _nodes: looked up by id() of the nodes made so far, like a
+	# JSONLD_Terse's, but iterating all of them, making the rest
+	def __init__(self, snapshot):
+		self._snapshot = snapshot
+
+	def __getitem__(self, ident):
+		return self._snapshot._nodesById[ident]
+
+	def __contains__(self, ident):
+		return ident in self._snapshot._nodesById
+
+	def __iter__(self):
+		return (id(self._snapshot._node(i)) for i in range(len(self)))
+
+	def __len__(self):
+		return len(self._snapshot._nodeStrings)
+
+class _SnapshotUris(collections.abc.Mapping):
+	# a JSONLD_TerseSnapshot's _uris, found by binary search
+	def __init__(self, snapshot):
+		self._snapshot = snapshot
+
+	def __getitem__(self, uri):
+		snapshot = self._snapshot
+		ident = snapshot._stringIndex(uri) if type(uri) == str else None
+		index = bisect.bisect_left(snapshot._uriIndex, ident, key=snapshot._nodeStrings.__getitem__) if ident is not None else len(self)
+		if index >= len(self) or snapshot._nodeStrings[snapshot._uriIndex[index]] != ident:
+			raise KeyError(uri)
+		return snapshot._node(snapshot._uriIndex[index])
+
+	def __iter__(self):
+		return (self._snapshot._string(self._snapshot._nodeStrings[each]) for each in self._snapshot._uriIndex)
+
+	def __len__(self):
+		return len(self._snapshot._uriIndex)
+
+class _SnapshotLiterals(collections.abc.Mapping):
+	# a JSONLD_TerseSnapshot's _literals, keyed by their index in the snapshot
+	def __init__(self, snapshot):
+		self._snapshot = snapshot
+
+	def __getitem__(self, index):
+		if type(index) != int or not 0 <= index < len(self):
+			raise KeyError(index)
+		return self._snapshot._literal(index)
+
+	def __iter__(self):
+		return iter(range(len(self)))
+
+	def __len__(self):
+		return len(self._snapshot._literalRecords) // 5
+
+class _SnapshotPredicates(collections.abc.Mapping):
+	# a JSONLD_TerseSnapshot's _subjectsByPredicate, from its predicate index
+	def __init__(self, snapshot):
+		self._snapshot = snapshot
+
+	def __getitem__(self, uri):
+		snapshot = self._snapshot
+		index = snapshot._stringIndex(uri) if type(uri) == str else None
+		lo, hi = snapshot._predicateRange(index) if index is not None else (0, 0)
+		if lo == hi:
+			raise KeyError(uri)
+		return tuple(snapshot._node(each) for each in sorted(set(snapshot._triples[3 * t] for t in snapshot._byPredicate[lo:hi])))
+
+	def __iter__(self):
+		snapshot = self._snapshot
+		key = lambda t: snapshot._triples[3 * t + 1]
+		lo = 0
+		while lo < len(snapshot._byPredicate):
+			predicate = key(snapshot._byPredicate[lo])
+			yield snapshot._string(predicate)
+			lo = bisect.bisect_right(snapshot._byPredicate, predicate, lo=lo, key=key)
+
+	def __len__(self):
+		return sum(1 for _ in self)
+
+def _flattenDocument(job):
+	# runs in a mergeDocuments worker process
+	source, documentUri, vocab, fallbackContext, maxDepth = job
+	graph = JSONLD_Terse()
+	root = graph.merge(json.loads(source) if type(source) in [str, bytes] else source, documentUri=documentUri, vocab=vocab, fallbackContext=fallbackContext, maxDepth=maxDepth)
+	return graph._flatten(root)
+
+class _Context:
+	"""An active context. Contexts are interned, so they hash and compare by identity."""
+
+	__slots__ = ("baseUri", "prefixes", "vocab", "__weakref__")
+
+	def __init__(self, baseUri, prefixes, vocab):
+		self.baseUri = baseUri
+		self.prefixes = prefixes
+		self.vocab = vocab
+
+class _Compactor:
+	"""Spells URIs as the terms, compact IRIs and @vocab-relative keys of a prefix map."""
+
+	# prefix URIs are looked up by each of their lengths, longest first, so the longest matching
+	# prefix is found with a few dict probes per URI. answers are remembered, since most URIs in a
+	# rendering are repeated.
+
+	def __init__(self, context):
+		self.prefixes = { name: uri for name, uri in context.items() if type(uri) == str and name[:1] != "@" and ":" not in name }
+		self.vocab = context.get("@vocab", None) if type(context.get("@vocab", None)) == str else None
+		self.context = dict(self.prefixes, **({ "@vocab": self.vocab } if self.vocab else {}))
+		self.names = {}
+		for name, uri in sorted(self.prefixes.items(), key=lambda each: (len(each[0]), each[0])):
+			self.names.setdefault(uri, name)
+		self.lengths = sorted(set(map(len, self.names)), reverse=True)
+		self.keys = {}
+		self.iris = {}
+
+	def iri(self, uri):
+		"""as an @id or datatype: a term or compact IRI"""
+		rv = self.iris.get(uri, None)
+		if rv is None:
+			rv = self.iris[uri] = self._compact(uri)
+		return rv
+
+	def key(self, uri):
+		"""as a member name or @type: also relative to @vocab"""
+		rv = self.keys.get(uri, None)
+		if rv is None:
+			rv = self.keys[uri] = self._compact(uri, self.vocab)
+		return rv
+
+	def datatype(self, uri):
+		return "@json" if uri == "http://www.w3.org/1999/02/22-rdf-syntax-ns#JSON" else self.iri(uri)
+
+	def _compact(self, uri, vocab = None):
+		if uri in self.names:
+			return self.names[uri]
+		if vocab and uri.startswith(vocab):
+			suffix = uri[len(vocab):]
+			if suffix and ":" not in suffix and suffix[:1] != "@" and suffix not in self.prefixes:
+				return suffix
+		for length in self.lengths:
+			if length < len(uri):
+				name = self.names.get(uri[:length], None)
+				if name is not None and uri[length:length + 2] != "//":
+					return name + ":" + uri[length:]
+		return uri
+
+class _JSONStreamReader:
+	"""A pull parser for JSON text read in chunks from a file-like object."""
+
+	_WHITESPACE = re.compile(r'[ \t\n\r]*')
+	_CONSTANTS = { "true": True, "false": False, "null": None, "NaN": float("nan"), "Infinity": float("inf"), "-Infinity": float("-inf") }
+
+	def __init__(self, fp, chunkSize = 65536):
+		self._fp = fp
+		self._chunkSize = chunkSize
+		self._decoder = None
+		self._buf = ""
+		self._pos = 0
+		self._eof = False
+
+	def peek(self):
+		while True:
+			self._pos = self._WHITESPACE.match(self._buf, self._pos).end()
+			if self._pos < len(self._buf):
+				return self._buf[self._pos]
+			if not self._fill():
+				return None
+
+	def expect(self, ch):
+		if self.peek() != ch:
+			self._error(f"Expecting '{ch}'")
+		self._pos += 1
+
+	def end(self):
+		if self.peek() is not None:
+			self._error("Extra data")
+
+	def members(self):
+		"""Yield each key of an Object. The caller must read or skip each member's value."""
+		self.expect("{")
+		if self.peek() == "}":
+			self._pos += 1
+			return
+		while True:
+			yield self.readKey()
+			if self.peek() != ",":
+				break
+			self._pos += 1
+		self.expect("}")
+
+	def elements(self):
+		"""Yield once for each element of an Array. The caller must read or skip each element."""
+		self.expect("[")
+		if self.peek() == "]":
+			self._pos += 1
+			return
+		while True:
+			yield
+			if self.peek() != ",":
+				break
+			self._pos += 1
+		self.expect("]")
+
+	def readKey(self):
+		if self.peek() != '"':
+			self._error("Expecting property name enclosed in double quotes")
+		key = self.readScalar()
+		self.expect(":")
+		return key
+
+	def readValue(self):
+		stack = []
+		while True:
+			ch = self.peek()
+			if ch == "{" or ch == "[":
+				self._pos += 1
+				value = {} if ch == "{" else []
+				if self.peek() != ("}" if ch == "{" else "]"):
+					stack.append((value, self.readKey() if ch == "{" else None))
+					continue
+				self._pos += 1
+			else:
+				value = self.readScalar()
+			while stack:
+				container, key = stack[-1]
+				if key is None:
+					container.append(value)
+				else:
+					container[key] = value
+				if self.peek() == ",":
+					self._pos += 1
+					if key is not None:
+						stack[-1] = (container, self.readKey())
+					break
+				self.expect("]" if key is None else "}")
+				stack.pop()
+				value = container
+			else:
+				return value
+
+	def readScalar(self):
+		while self.peek() == '"':
+			try:
+				value, self._pos = json.decoder.scanstring(self._buf, self._pos + 1, True)
+				return value
+			except json.JSONDecodeError:
+				if not self._fill():
+					raise
+		while len(self._buf) - self._pos < 10 and self._fill():
+			pass
+		for name, value in self._CONSTANTS.items():
+			if self._buf.startswith(name, self._pos):
+				self._pos += len(name)
+				return value
+		while (match := json.scanner.NUMBER_RE.match(self._buf, self._pos)) and match.end() == len(self._buf) and self._fill():
+			pass
+		if match is None:
+			self._error("Expecting value")
+		integer, frac, exp = match.groups()
+		self._pos = match.end()
+		return float(integer + (frac or "") + (exp or "")) if frac or exp else int(integer)
+
+	def _fill(self):
+		while not self._eof:
+			chunk = self._fp.read(self._chunkSize)
+			if isinstance(chunk, bytes):
+				if self._decoder is None:
+					self._decoder = codecs.getincrementaldecoder("utf-8")()
+				self._eof = not chunk
+				chunk = self._decoder.decode(chunk, final=self._eof)
+			elif not chunk:
+				self._eof = True
+			if chunk:
+				self._buf = self._buf[self._pos:] + chunk
+				self._pos = 0
+				return True
+		return False
+
+	def _error(self, message):
+		raise json.JSONDecodeError(message, self._buf, self._pos)
@@ -0,0 +1,471 @@
+#! /usr/bin/env python3 --
+
+from jsonldterse import JSONLD_Terse, JSONLD_TerseSnapshot
+from jsonldterse_loader import JSONLD_TerseLoader
+import json
+import argparse
+import asyncio
+import gc
+import http.server
+import multiprocessing
+import os
+import tempfile
+import time
+import tracemalloc
+import urllib.parse
+import urllib.request
+
+parser = argparse.ArgumentParser()
+parser.add_argument('-n', '--size', default=20000, type=int, help="number of container members in synthetic documents")
+parser.add_argument('-f', '--only', default=None, help="only run this benchmark")
+parser.add_argument('--no-memory', default=False, action="store_true", help="skip the (slow) peak memory measurements")
+
+args = parser.parse_args()
+
+def syntheticContainer(members, page = 0):
+	"""a container page in the style of api.md, with members numbered from page * members"""
+	return {
+		"@context": {
+			"api": "http://zenomt.com/ns/terse-api#",
+			"ex": "http://example.com/ns#"
+		},
+		"@id": ".",
+		"@type": "api:Container",
+		"api:containerOf": { "@id": "ex:Item" },
+		"api:member": [ { "@id": str(i), "@type": "ex:Item", "ex:name": f"example item {i}", "ex:rank": i % 100 } for i in range(page * members, (page + 1) * members) ],
+		"ex:usefulInfo": { "@id": ".#info", "ex:comment": "I can safely appear in each page." }
+	}
+
+class NullWriter:
+	def __init__(self):
+		self.size = 0
+
+	def write(self, s):
+		self.size += len(s)
+
+def measure(fn):
+	"""answer (seconds, peak traced bytes or None) for calling fn"""
+	start = time.perf_counter()
+	fn()
+	elapsed = time.perf_counter() - start
+	if args.no_memory:
+		return elapsed, None
+	tracemalloc.start()
+	fn()
+	peak = tracemalloc.get_traced_memory()[1]
+	tracemalloc.stop()
+	return elapsed, peak
+
+def report(name, elapsed, peak, count = None, unit = "triples"):
+	rate = f"  {count / elapsed:12.0f} {unit}/s" if count else ""
+	memory = f"  peak {peak / 1048576:8.2f} MiB" if peak is not None else ""
+	print(f"  {name:32s} {elapsed * 1000:10.2f} ms{rate}{memory}")
+
+def bench_merge():
+	"""merging a wide container, with and without the context and URI expansion caches"""
+	doc = syntheticContainer(args.size)
+	print(f"\nbench_merge: {args.size} members")
+	for cacheSize in [0, 4096]:
+		graphs = []
+		elapsed, peak = measure(lambda: graphs.append(JSONLD_Terse(doc, documentUri="https://example.com/api/items/", cacheSize=cacheSize)))
+		uris = graphs[0].cacheInfo()["uris"]
+		report(f"merge cacheSize={cacheSize}", elapsed, peak, args.size, "members")
+		print(f"  {'':32s} uri cache hits {uris.hits} misses {uris.misses}")
+	if not args.no_memory:
+		# the memory kept by the graph and its indexes
+		gc.collect()
+		tracemalloc.start()
+		graph = JSONLD_Terse(doc, documentUri="https://example.com/api/items/")
+		gc.collect()
+		retained = tracemalloc.get_traced_memory()[0]
+		tracemalloc.stop()
+		triples = len(graph.asTriples())
+		print(f"  {'retained':32s} {retained / 1048576:10.2f} MiB  {retained / triples:12.0f} bytes/triple")
+
+def bench_mergeDocuments():
+	"""sequential merges of container pages versus mergeDocuments with increasing worker processes"""
+	pageSize = 500
+	pages = [(json.dumps(syntheticContainer(pageSize, page)), "https://example.com/api/items/") for page in range(max(1, args.size // pageSize))]
+	print(f"\nbench_mergeDocuments: {len(pages)} pages of {pageSize} members, {os.cpu_count()} cpus")
+	def sequential():
+		graph = JSONLD_Terse()
+		for text, documentUri in pages:
+			graph.merge(json.loads(text), documentUri=documentUri)
+	start = time.perf_counter()
+	sequential()
+	report("sequential merge", time.perf_counter() - start, None, len(pages), "pages")
+	for processes in [1, 2, 4, 8]:
+		start = time.perf_counter()
+		JSONLD_Terse().mergeDocuments(pages, processes=processes, chunksize=4)
+		report(f"mergeDocuments processes={processes}", time.perf_counter() - start, None, len(pages), "pages")
+
+def bench_pages():
+	"""merging increasing numbers of container pages into one graph; time per member should stay flat"""
+	pageSize = 20
+	print(f"\nbench_pages: pages of {pageSize} members into one container")
+	for pages in [args.size // pageSize // 8, args.size // pageSize // 4, args.size // pageSize // 2, args.size // pageSize]:
+		docs = [syntheticContainer(pageSize, page) for page in range(max(1, pages))]
+		def mergePages():
+			graph = JSONLD_Terse()
+			for doc in docs:
+				graph.merge(doc, documentUri="https://example.com/api/items/")
+		elapsed = measure(mergePages)[0]
+		report(f"{len(docs)} pages", elapsed, None, len(docs) * pageSize, "members")
+		print(f"  {'':32s} {elapsed * 1e6 / (len(docs) * pageSize):10.2f} us/member")
+
+def syntheticChain(depth, start = 0):
+	"""a document nesting depth nodes, each the ex:next of the one before"""
+	doc = { "@id": f"#n{start + depth}", "ex:name": f"node {start + depth}" }
+	for i in range(start + depth - 1, start - 1, -1):
+		doc = { "@id": f"#n{i}", "ex:name": f"node {i}", "ex:next": doc }
+	return dict(doc, **{ "@context": { "ex": "http://example.com/ns#" } })
+
+def bench_depth():
+	"""merge and asTree throughput on wide documents and on deep ones, including deeper than the recursion limit"""
+	wide = syntheticContainer(args.size)
+	shallow = [syntheticChain(100, i * 101) for i in range(max(1, args.size // 100))]
+	deep = syntheticChain(args.size)
+	print(f"\nbench_depth: {args.size} nodes wide, {len(shallow)} chains of 100 nodes, one chain of {args.size} nodes")
+	for name, docs, maxDepth in [("wide", [wide], 64), ("100 deep", shallow, 512), (f"{args.size} deep", [deep], args.size * 2 + 2)]:
+		graphs = []
+		def mergeAll():
+			graphs[:] = [JSONLD_Terse()]
+			for doc in docs:
+				graphs[0].merge(doc, documentUri="https://example.com/doc", maxDepth=maxDepth)
+		try:
+			elapsed = measure(mergeAll)[0]
+		except RecursionError:
+			print(f"  merge {name:26s} RecursionError")
+			continue
+		count = len(graphs[0].nodes)
+		report(f"merge {name}", elapsed, None, count, "nodes")
+		try:
+			report(f"asTree {name}", measure(lambda: graphs[0].asTree())[0], None, count, "nodes")
+		except RecursionError:
+			print(f"  asTree {name:25s} RecursionError")
+
+def bench_compact():
+	"""memory per triple of merged graphs versus their compact() copies"""
+	examples = []
+	for name in ["example.jsonld", "example3.jsonld", "example6.jsonld"]:
+		with open(name, "r", encoding="utf-8") as f:
+			examples.append(json.load(f))
+	def build():
+		graph = JSONLD_Terse(syntheticContainer(args.size), documentUri="https://example.com/api/items/")
+		for i in range(args.size // 20):
+			for doc in examples:
+				graph.merge(doc, documentUri=f"https://example.com/{i}/doc.jsonld")
+		return graph
+	count = sum(1 for _ in build().iterTriples())
+	print(f"\nbench_compact: {count} triples")
+	for name, make in [("JSONLD_Terse", build), ("JSONLD_TerseCompact", lambda: build().compact())]:
+		gc.collect()
+		tracemalloc.start()
+		graph = make()
+		gc.collect()
+		size = tracemalloc.get_traced_memory()[0]
+		tracemalloc.stop()
+		del graph
+		print(f"  {name:32s} {size / 1048576:10.2f} MiB  {size / count:8.1f} bytes/triple")
+
+def syntheticLiterals(copies):
+	"""example3.jsonld with copies of its @included nodes, which are mostly literals"""
+	with open("example3.jsonld", "r", encoding="utf-8") as f:
+		example = json.load(f)
+	return dict(example, **{ "@included": [dict(each, **{ "@id": f"#test{i}" }) for i in range(copies) for each in example["@included"]] })
+
+def syntheticContexts(members):
+	"""a container whose members each have their own @context, from a rotating set of 50 prefixes and vocabularies"""
+	return {
+		"@context": { "api": "http://zenomt.com/ns/terse-api#" },
+		"@id": ".",
+		"@type": "api:Container",
+		"api:member": [ {
+			"@context": { f"p{i % 50}": f"http://example.com/ns{i % 50}#", "@vocab": f"http://example.com/vocab{i % 7}#" },
+			"@id": str(i),
+			"@type": f"p{i % 50}:Item",
+			f"p{i % 50}:name": f"example item {i}",
+			"rank": i % 100,
+			"detail": { "@context": { "@vocab": "http://example.com/detail#" }, "@id": f"{i}#detail", "size": i }
+		} for i in range(members) ]
+	}
+
+def bench_literals():
+	"""merging literal-heavy documents, and _adaptLiteral on plain, typed and language-tagged literals"""
+	doc = syntheticLiterals(args.size // 10)
+	count = len(JSONLD_Terse(doc).asTriples())
+	print(f"\nbench_literals: example3.jsonld scaled to {count} triples")
+	report("merge", *measure(lambda: JSONLD_Terse(doc)), count)
+	for name, node in [
+		("_adaptLiteral plain", { "@value": "literal" }),
+		("_adaptLiteral number", { "@value": 3 }),
+		("_adaptLiteral typed", { "@value": "2024-01-01", "@type": "xsd:date" }),
+		("_adaptLiteral language", { "@value": "literal", "@language": "en-us" }),
+		("_adaptLiteral JSON", { "@value": { "a": [1, 2, 3] }, "@type": "@json" })
+	]:
+		literals = {}
+		prefixes = { "xsd": "http://www.w3.org/2001/XMLSchema#" }
+		def adapt():
+			for i in range(args.size * 10):
+				JSONLD_Terse._adaptLiteral(node, prefixes=prefixes, literals=literals)
+		report(name, measure(adapt)[0], None, args.size * 10, "literals")
+
+def bench_json():
+	"""writeJSON streaming to a file versus writing asJSON's string"""
+	graph = JSONLD_Terse(syntheticContainer(args.size), documentUri="https://example.com/api/items/")
+	count = len(graph.nodes)
+	print(f"\nbench_json: {count} nodes")
+	report("asJSON", *measure(lambda: NullWriter().write(graph.asJSON(base="https://example.com/api/items/"))), count, "nodes")
+	report("writeJSON", *measure(lambda: graph.writeJSON(NullWriter(), base="https://example.com/api/items/")), count, "nodes")
+
+def bench_compaction():
+	"""output size and render throughput, expanded versus compacted with an inferred @context"""
+	graph = JSONLD_Terse(syntheticContainer(args.size), documentUri="https://example.com/api/items/")
+	for name in ["example.jsonld", "example6.jsonld"]:
+		with open(name, "r", encoding="utf-8") as f:
+			graph.merge(json.load(f), documentUri="https://example.com/api/items/" + name)
+	count = len(graph.nodes)
+	print(f"\nbench_compaction: {count} nodes")
+	for name, options in [("expanded", {}), ("compacted", dict(context=True))]:
+		size = len(graph.asJSON(base="https://example.com/api/items/", **options))
+		report(f"asJSON {name}", measure(lambda: graph.asJSON(base="https://example.com/api/items/", **options))[0], None, count, "nodes")
+		report(f"writeJSON {name}", measure(lambda: graph.writeJSON(NullWriter(), base="https://example.com/api/items/", **options))[0], None, count, "nodes")
+		print(f"  {'':32s} {size:10d} characters")
+
+def bench_patch():
+	"""PATCH latency against graph size, which should stay flat, versus rebuilding the graph for each change"""
+	print(f"\nbench_patch: container of n members, 100 PATCHes each renaming a member and removing a rank by api:any")
+	for members in [args.size // 8, args.size // 4, args.size // 2, args.size]:
+		doc = syntheticContainer(max(1, members))
+		graph = JSONLD_Terse(doc, documentUri="https://example.com/api/items/")
+		bodies = [{
+			"@context": dict(doc["@context"], api="http://zenomt.com/ns/terse-api#"),
+			"@remove": [
+				{ "@id": str(i), "ex:name": { "@id": "api:any" } },
+				{ "@id": "api:any", "ex:rank": i % 100 }
+			],
+			"@id": str(i),
+			"ex:name": f"renamed item {i}"
+		} for i in range(0, max(1, members), max(1, members // 100))]
+		def patchAll():
+			for body in bodies:
+				graph.patch(body, documentUri="https://example.com/api/items/")
+		elapsed = measure(patchAll)[0]
+		report(f"patch {members} members", elapsed, None, len(bodies), "patches")
+		print(f"  {'':32s} {elapsed * 1e6 / len(bodies):10.2f} us/patch")
+		report(f"rebuild {members} members", measure(lambda: JSONLD_Terse(doc, documentUri="https://example.com/api/items/"))[0], None, 1, "rebuilds")
+
+def bench_replace():
+	"""replacing one page of a paged container, which should take the same time at any size, versus rebuilding from every page"""
+	pageSize = 100
+	print(f"\nbench_replace: container of n members in pages of {pageSize}, replacing a page with one renaming its members")
+	for members, lists in [(args.size // 8, False), (args.size // 4, False), (args.size // 2, False), (args.size, False), (args.size // 8, True), (args.size, True)]:
+		pages = [(syntheticContainer(pageSize, k), f"https://example.com/api/items/?page={k}") for k in range(max(1, members // pageSize))]
+		if lists:
+			print("  with an @list in each member")
+			for doc, _ in pages:
+				for each in doc["api:member"]:
+					each["ex:tags"] = { "@list": [ "tag", { "@id": "#tag" } ] }
+		def build(provenance):
+			rv = JSONLD_Terse(provenance=provenance)
+			for doc, documentUri in pages:
+				rv.merge(doc, documentUri=documentUri)
+			return rv
+		report(f"merge {members} members", measure(lambda: build(False))[0], None, members, "members")
+		report(f"merge with provenance", measure(lambda: build(True))[0], None, members, "members")
+		graph = build(True)
+		doc, documentUri = pages[len(pages) // 2]
+		edited = dict(doc, **{ "api:member": [ dict(each, **{ "ex:name": each["ex:name"] + " (renamed)" }) for each in doc["api:member"] ] })
+		elapsed = measure(lambda: (graph.replace(edited, documentUri=documentUri), graph.replace(doc, documentUri=documentUri)))[0] / 2
+		report(f"replace {members} members", elapsed, None, pageSize, "members")
+		report(f"retract and merge", measure(lambda: (graph.retract(documentUri), graph.merge(doc, documentUri=documentUri)))[0], None, pageSize, "members")
+		assert len(graph.asTriples()) == len(build(False).asTriples())
+
+def bench_query():
+	"""typical 2-4 pattern queries on a wide container, versus hand-written nested selects with filter lambdas"""
+	graph = JSONLD_Terse(syntheticContainer(args.size), documentUri="https://example.com/api/items/")
+	container = "https://example.com/api/items/"
+	member = "http://zenomt.com/ns/terse-api#member"
+	rdfType = "http://www.w3.org/1999/02/22-rdf-syntax-ns#type"
+	item = "http://example.com/ns#Item"
+	name = "http://example.com/ns#name"
+	rank = "http://example.com/ns#rank"
+	print(f"\nbench_query: {args.size} members")
+	def endsWith07(s, p, o):
+		return o["@value"].endswith("07")
+	queries = [
+		("member by type and name", [ (container, member, "?m"), ("?m", rdfType, item), ("?m", name, { "@value": "example item 42" }) ],
+			lambda: [ m for m in graph.select(s=container, p=member, column="_object") if graph.select(s=m, p=rdfType, o=item) and graph.select(s=m, p=name, literal="example item 42") ]),
+		("ranked members' names", [ ("?m", rank, 7), ("?m", name, "?n") ],
+			lambda: [ (m, n) for m in graph.select(p=rank, literal=7, column="subject") for n in graph.select(s=m, p=name, column="_object") ]),
+		("4 patterns with a filter", [ (container, member, "?m"), ("?m", rdfType, item), ("?m", rank, 7), ("?m", name, "?n", endsWith07) ],
+			lambda: [ (m, n) for m in graph.select(s=container, p=member, column="_object") if graph.select(s=m, p=rdfType, o=item) and graph.select(s=m, p=rank, literal=7) for n in graph.select(s=m, p=name, filter=endsWith07, column="_object") ]),
+		("same rank as a named item", [ ("?m", rank, "?k"), ("?other", rank, "?k"), ("?other", name, { "@value": "example item 5" }) ],
+			lambda: [ (m, k) for m in graph.select(p=rank, column="subject") for k in graph.select(s=m, p=rank, column="_object") if graph.select(p=name, literal="example item 5", filter=lambda s, p, o: k in s[rank]) ]),
+		("every member's name", [ (container, member, "?m"), ("?m", rdfType, item), ("?m", name, "?n") ],
+			lambda: [ (m, n) for m in graph.select(s=container, p=member, column="_object") if graph.select(s=m, p=rdfType, o=item) for n in graph.select(s=m, p=name, column="_object") ])
+	]
+	for label, patterns, naive in queries:
+		count = len(list(graph.query(patterns)))
+		assert count == len(naive())
+		print(f"  {label} ({count} results)")
+		report("query", measure(lambda: list(graph.query(patterns)))[0], None, count, "results")
+		report("first result", measure(lambda: next(graph.query(patterns)))[0], None)
+		report("nested select", measure(naive)[0], None, count, "results")
+
+def bench_pager():
+	"""rendering the first, middle and last pages of a container, which should take the same time at any size, versus asJSON of the whole graph"""
+	pageSize = 100
+	print(f"\nbench_pager: pages of {pageSize} members")
+	for members in [args.size // 8, args.size // 4, args.size // 2, args.size]:
+		graph = JSONLD_Terse(syntheticContainer(max(1, members)), documentUri="https://example.com/api/items/")
+		elapsed = measure(lambda: graph.pager(pageSize=pageSize))[0]
+		report(f"pager {members} members", elapsed, None, members, "members")
+		pager = graph.pager(pageSize=pageSize)
+		for k in [0, len(pager) // 2, len(pager) - 1]:
+			elapsed = measure(lambda: pager.pageJSON(k))[0]
+			report(f"pageJSON({k})", elapsed, None, pageSize, "members")
+		report("asJSON", measure(lambda: graph.asJSON(base="https://example.com/api/items/"))[0], None, members, "members")
+	graph = JSONLD_Terse(syntheticContainer(args.size), documentUri="https://example.com/api/items/")
+	report(f"pager pageBytes=65536", measure(lambda: graph.pager(pageBytes=65536))[0], None, args.size, "members")
+
+def bench_snapshot():
+	"""cold start from a snapshot versus parsing and merging the JSON, then a first get and select"""
+	graph = JSONLD_Terse(syntheticContainer(args.size), documentUri="https://example.com/api/items/")
+	count = len(graph.asTriples())
+	with tempfile.TemporaryDirectory() as directory:
+		jsonPath = os.path.join(directory, "graph.jsonld")
+		snapshotPath = os.path.join(directory, "graph.snapshot")
+		with open(jsonPath, "w", encoding="utf-8") as f:
+			json.dump(syntheticContainer(args.size), f)
+		def write():
+			with open(snapshotPath, "wb") as f:
+				graph.writeSnapshot(f)
+		elapsed = measure(write)[0]
+		print(f"\nbench_snapshot: {count} triples, {os.path.getsize(jsonPath)} bytes of JSON, {os.path.getsize(snapshotPath)} bytes of snapshot")
+		report("writeSnapshot", elapsed, None, count)
+		def parse():
+			with open(jsonPath, "r", encoding="utf-8") as f:
+				return JSONLD_Terse(json.load(f), documentUri="https://example.com/api/items/")
+		snapshots = []
+		def load():
+			snapshots.append(JSONLD_TerseSnapshot(snapshotPath))
+			return snapshots[-1]
+		for name, start in [("parse JSON", parse), ("load snapshot", load)]:
+			report(name, *measure(start), count)
+			loaded = start()
+			report("  first get", measure(lambda: loaded.get(f"https://example.com/api/items/{args.size // 2}")["http://example.com/ns#name"])[0], None)
+			report("  first select", measure(lambda: loaded.select(p="http://example.com/ns#rank", literal=7))[0], None)
+			report("  next select", measure(lambda: loaded.select(p="http://example.com/ns#rank", literal=8))[0], None)
+			report("  asTriples", measure(loaded.asTriples)[0], None, count)
+		for each in snapshots:
+			each.close()
+
+def bench_suite():
+	"""merge, select, asTree, asJSON and asTriples on each kind of synthetic document, with the time in each phase of an instrumented merge and asJSON"""
+	families = [
+		("wide", syntheticContainer(args.size), 64),
+		("deep", { "@included": [syntheticChain(100, i * 101) for i in range(max(1, args.size // 100))] }, 512),
+		("literals", syntheticLiterals(args.size // 10), 64),
+		("contexts", syntheticContexts(args.size // 2), 64)
+	]
+	for name, doc, maxDepth in families:
+		graph = JSONLD_Terse(doc, documentUri="https://example.com/api/items/", maxDepth=maxDepth)
+		triples = graph.asTriples()
+		print(f"\nbench_suite {name}: {len(graph.nodes)} nodes, {len(triples)} triples")
+		queries = []
+		for each in triples[::max(1, len(triples) // 100)]:
+			_object = each["_object"]
+			if type(_object) == dict and "@id" in _object and _object["@id"][:2] != "_:":
+				queries.append(dict(p=each["predicate"], o=_object["@id"]))
+			elif type(_object) == dict and "@value" in _object:
+				queries.append(dict(p=each["predicate"], literal=_object["@value"]))
+		def merge():
+			JSONLD_Terse(doc, documentUri="https://example.com/api/items/", maxDepth=maxDepth)
+		report("merge", measure(merge)[0], None, len(triples))
+		report(f"select x{len(queries)}", measure(lambda: [graph.select(**query) for query in queries])[0], None, len(queries), "selects")
+		report("asTree", measure(graph.asTree)[0], None, len(graph.nodes), "nodes")
+		report("asJSON", measure(graph.asJSON)[0], None, len(graph.nodes), "nodes")
+		report("asTriples", measure(graph.asTriples)[0], None, len(triples))
+		instrumented = JSONLD_Terse()
+		instrumented.instrument()
+		elapsed = measure(lambda: instrumented.merge(doc, documentUri="https://example.com/api/items/", maxDepth=maxDepth))[0]
+		report("merge instrumented", elapsed, None, len(triples))
+		instrumented.asJSON()
+		for phase, info in instrumented.phaseInfo().items():
+			print(f"  {'':4s}{phase:28s} {info.seconds * 1000:10.2f} ms  {info.calls:12d} calls")
+
+class PagedHandler(http.server.BaseHTTPRequestHandler):
+	# serves the server's pre-rendered bodies by path, after the server's delay
+	protocol_version = "HTTP/1.1"
+	disable_nagle_algorithm = True
+
+	def do_GET(self):
+		time.sleep(self.server.delay)
+		body = self.server.bodies.get(self.path, b"")
+		self.send_response(200 if body else 404)
+		self.send_header("Content-Type", "application/ld+json")
+		self.send_header("Content-Length", str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def log_message(self, *args):
+		pass
+
+def servePages(bodies, delay, connection):
+	# runs in its own process, so the server doesn't compete with the client for the GIL
+	server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), PagedHandler)
+	server.daemon_threads = True
+	server.bodies = bodies
+	server.delay = delay
+	connection.send(server.server_address[1])
+	server.serve_forever()
+
+def bench_loader():
+	"""loading a paged container from a local server with 10 ms of latency, sequentially with urllib versus JSONLD_TerseLoader"""
+	pageSize = 100
+	container = "http://127.0.0.1/api/items/"
+	pager = JSONLD_Terse(syntheticContainer(args.size), documentUri=container).pager(pageSize=pageSize)
+	bodies = {}
+	for k in range(len(pager)):
+		bodies[urllib.parse.urlsplit(pager.pageUri(k)).path] = pager.pageJSON(k).encode("utf-8")
+	receiver, sender = multiprocessing.Pipe(False)
+	server = multiprocessing.Process(target=servePages, args=(bodies, 0.01, sender), daemon=True)
+	server.start()
+	container = f"http://127.0.0.1:{receiver.recv()}/api/items/"
+	print(f"\nbench_loader: {len(pager)} pages of {pageSize} members")
+	def sequential():
+		graph = JSONLD_Terse()
+		uri = container
+		while uri:
+			with urllib.request.urlopen(uri) as response:
+				doc = json.load(response)
+			graph.merge(doc, documentUri=uri)
+			nextPage = JSONLD_Terse(doc["@metadata"], documentUri=uri, fallbackContext=JSONLD_Terse.effectiveRootContext(doc, documentUri=uri)).get(uri).get("http://zenomt.com/ns/terse-api#nextPage", None)
+			uri = nextPage[0]["@id"] if nextPage else None
+	async def load(**kwargs):
+		async with JSONLD_TerseLoader(**kwargs) as loader:
+			assert len((await loader.load(container)).select(p="http://zenomt.com/ns/terse-api#member")) == args.size
+	try:
+		report("urllib nextPage loop", measure(sequential)[0], None, len(pager), "pages")
+		for kwargs in [dict(connections=1, guessPages=False), dict(connections=2, guessPages=False), dict(connections=4), dict(connections=16)]:
+			report(" ".join(f"{k}={v}" for k, v in kwargs.items()), measure(lambda: asyncio.run(load(**kwargs)))[0], None, len(pager), "pages")
+	finally:
+		server.terminate()
+
+def bench_ntriples():
+	"""streaming writeNTriples versus building asTriples and dumping each triple as JSON"""
+	graph = JSONLD_Terse(syntheticContainer(args.size), documentUri="https://example.com/api/items/")
+	count = len(graph.asTriples())
+	print(f"\nbench_ntriples: {count} triples")
+	def listPath():
+		out = NullWriter()
+		for each in graph.asTriples():
+			out.write(f"{each['subject']} {each['predicate']} {json.dumps(each['_object'])}\n")
+	report("asTriples + json.dumps", *measure(listPath), count)
+	report("writeNTriples", *measure(lambda: graph.writeNTriples(NullWriter())), count)
+
+if __name__ == "__main__":
+	for name, bench in list(globals().items()):
+		if name.startswith("bench_") and (args.only is None or name == args.only or name == "bench_" + args.only):
+			bench()
@@ -0,0 +1,252 @@
+# Copyright © 2025 Michael Thornburgh
+# SPDX-License-Identifier: MIT
+
+from jsonldterse import JSONLD_Terse
+from urllib.parse import urlsplit, urljoin, urldefrag
+import asyncio
+import json
+import re
+import ssl
+import urllib.error
+
+class JSONLD_TerseLoader:
+	"""Load paged resources (per api.md) into a JSONLD_Terse with asyncio."""
+
+	# pages are fetched on up to connections HTTP/1.1 connections per origin, which are kept open
+	# and reused, and each is merged as it arrives with its response URI as its documentUri. pages
+	# linked from a page's metadata graph (api:nextPage, api:prevPage, api:firstPage, api:lastPage)
+	# are fetched as they're found, so the pages after the next and before the last are fetched at
+	# the same time. if guessPages, the pages between the next and the last are also fetched as
+	# soon as both are known, if their URIs differ only in one number. a guessed page that's
+	# missing, isn't JSON or isn't a page of the same resource is skipped, but it's fetched again
+	# (and not skipped) if a page links to it. responses with an ETag are fetched again
+	# conditionally.
+
+	ACCEPT = 'application/ld+json; profile="http://zenomt.com/ns/jsonld-terse http://zenomt.com/ns/terse-api"'
+
+	_API = "http://zenomt.com/ns/terse-api#"
+	_LINKS = ["nextPage", "prevPage", "firstPage", "lastPage"]
+	_REDIRECTS = { 301, 302, 303, 307, 308 }
+
+	def __init__(self, connections = 4, guessPages = True, headers = None, sslContext = None, maxRedirects = 5):
+		self._connections = connections
+		self._slots = {}
+		self._guessPages = guessPages
+		self._headers = dict(headers or {})
+		self._sslContext = sslContext
+		self._maxRedirects = maxRedirects
+		self._idle = {}
+		self._etags = {}
+		self._info = dict(requests=0, notModified=0, connections=0, pages=0)
+
+	async def __aenter__(self):
+		return self
+
+	async def __aexit__(self, *exc):
+		await self.close()
+
+	async def close(self):
+		"""Close the idle connections."""
+		connections = [connection for each in self._idle.values() for connection in each]
+		self._idle = {}
+		for _, writer in connections:
+			writer.close()
+		for _, writer in connections:
+			try:
+				await writer.wait_closed()
+			except OSError:
+				pass
+
+	def loadInfo(self):
+		"""Answer the numbers of requests, 304 responses, connections opened and pages merged."""
+		return dict(self._info)
+
+	async def load(self, uri, graph = None, vocab = None, fallbackContext = None, maxDepth = 64):
+		"""Merge the paged resource at uri and its pages into graph (or a new one), answering it."""
+		graph = graph if graph is not None else JSONLD_Terse()
+		uri = urldefrag(uri)[0]
+		seen = set()
+		linked = set([uri])
+		resource = None
+		tasks = {}
+		def fetchPage(link, guessed):
+			# tasks answers the link of a guessed page, or None
+			seen.add(link)
+			tasks[asyncio.ensure_future(self._fetchPage(link, vocab, fallbackContext))] = link if guessed else None
+		def unguess(link):
+			# a guessed page that isn't one is fetched again if it's linked, and not skipped then
+			seen.discard(link)
+			if link in linked:
+				fetchPage(link, False)
+		fetchPage(uri, False)
+		try:
+			while tasks:
+				done, _ = await asyncio.wait(tasks.keys(), return_when=asyncio.FIRST_COMPLETED)
+				for task in done:
+					guess = tasks.pop(task)
+					try:
+						documentUri, doc, metadata, pageUri = task.result()
+					except (urllib.error.HTTPError, json.JSONDecodeError, UnicodeDecodeError) as e:
+						if guess is None or (type(e) == urllib.error.HTTPError and e.code != 404):
+							raise
+						unguess(guess)
+						continue
+					page = metadata.get(pageUri) if metadata is not None else None
+					pageOf = self._link(page, "pageOf")
+					if guess is not None and (pageOf is None or pageOf != resource):
+						unguess(guess)
+						continue
+					resource = resource or pageOf
+					graph.merge(doc, documentUri=documentUri, vocab=vocab, fallbackContext=fallbackContext, maxDepth=maxDepth)
+					self._info["pages"] += 1
+					links = {}
+					for node in [page, metadata.get(pageOf) if pageOf is not None else None]:
+						for name in self._LINKS:
+							links.setdefault(name, self._link(node, name))
+					for link in links.values():
+						if link is not None:
+							linked.add(link)
+							if link not in seen:
+								fetchPage(link, False)
+					if self._guessPages and links["nextPage"] is not None and links["lastPage"] is not None:
+						for link in self._pagesBetween(links["nextPage"], links["lastPage"]):
+							if link not in seen:
+								fetchPage(link, True)
+		finally:
+			for task in tasks:
+				task.cancel()
+			if tasks:
+				await asyncio.wait(tasks.keys())
+		return graph
+
+	async def fetch(self, uri, headers = None):
+		"""GET uri, following redirects, answering (final URI, status, headers, body)."""
+		# if uri's response had an ETag, the request is conditional, and a 304 Not Modified response
+		# is answered with the remembered status, headers and body
+		for _ in range(self._maxRedirects + 1):
+			requestHeaders = dict(self._headers, **(headers or {}))
+			remembered = self._etags.get(uri, None)
+			if remembered is not None:
+				requestHeaders["If-None-Match"] = remembered[0]
+			status, reason, responseHeaders, body = await self._request(uri, requestHeaders)
+			if status == 304 and remembered is not None:
+				self._info["notModified"] += 1
+				return (uri,) + remembered[1]
+			if status in self._REDIRECTS and "location" in responseHeaders:
+				uri = urldefrag(urljoin(uri, responseHeaders["location"]))[0]
+				continue
+			if status < 200 or status >= 300:
+				raise urllib.error.HTTPError(uri, status, reason, responseHeaders, None)
+			if "etag" in responseHeaders:
+				self._etags[uri] = (responseHeaders["etag"], (status, responseHeaders, body))
+			return uri, status, responseHeaders, body
+		raise urllib.error.HTTPError(uri, status, "too many redirects", responseHeaders, None)
+
+	async def _fetchPage(self, uri, vocab, fallbackContext):
+		# answers (documentUri, document, metadata graph or None, the metadata's subject R)
+		documentUri, _, headers, body = await self.fetch(uri, dict(Accept=self.ACCEPT))
+		doc = json.loads(body.decode("utf-8"))
+		location = headers.get("content-location", None) or headers.get("location", None)
+		pageUri = urldefrag(urljoin(documentUri, location))[0] if location else documentUri
+		metadata = None
+		if type(doc) == dict and doc.get("@metadata", None) is not None:
+			context = JSONLD_Terse.effectiveRootContext(doc, documentUri=documentUri, vocab=vocab, fallbackContext=fallbackContext)
+			metadata = JSONLD_Terse(doc["@metadata"], documentUri=documentUri, fallbackContext=context)
+		return documentUri, doc, metadata, pageUri
+
+	@classmethod
+	def _link(cls, node, name):
+		for each in (node or {}).get(cls._API + name, []):
+			if type(each) == dict and "@id" in each:
+				return urldefrag(each["@id"])[0]
+
+	@staticmethod
+	def _pagesBetween(nextUri, lastUri):
+		# the URIs strictly between nextUri and lastUri if they differ only in one decimal number
+		first = re.split("([0-9]+)", nextUri)
+		last = re.split("([0-9]+)", lastUri)
+		differences = [i for i in range(len(first)) if len(first) == len(last) and first[i] != last[i]]
+		if len(differences) != 1 or differences[0] % 2 == 0:
+			return []
+		i = differences[0]
+		if first[i] != str(int(first[i])) or last[i] != str(int(last[i])):
+			return []
+		return ["".join(first[:i] + [str(n)] + first[i + 1:]) for n in range(int(first[i]) + 1, int(last[i]))]
+
+	async def _request(self, uri, headers):
+		split = urlsplit(uri)
+		if split.scheme not in ["http", "https"]:
+			raise ValueError(f"can't fetch {uri}")
+		key = (split.scheme, split.hostname, split.port or (443 if split.scheme == "https" else 80))
+		host = split.netloc.rpartition("@")[2]
+		target = (split.path or "/") + ("?" + split.query if split.query else "")
+		request = f"GET {target} HTTP/1.1\r\nHost: {host}\r\n" + "".join(f"{name}: {value}\r\n" for name, value in headers.items()) + "\r\n"
+		if key not in self._slots:
+			self._slots[key] = asyncio.Semaphore(self._connections)
+		async with self._slots[key]:
+			while True:
+				reused = bool(self._idle.get(key, None))
+				reader, writer = self._idle[key].pop() if reused else await self._connect(key)
+				try:
+					writer.write(request.encode("latin-1"))
+					await writer.drain()
+					status, reason, responseHeaders, body, keepAlive = await self._readResponse(reader)
+				except (ConnectionError, asyncio.IncompleteReadError):
+					writer.close()
+					if reused:
+						# the server closed the idle connection, so try again on another
+						continue
+					raise
+				except BaseException:
+					writer.close()
+					raise
+				self._info["requests"] += 1
+				if keepAlive:
+					self._idle.setdefault(key, []).append((reader, writer))
+				else:
+					writer.close()
+				return status, reason, responseHeaders, body
+
+	async def _connect(self, key):
+		scheme, host, port = key
+		context = (self._sslContext or ssl.create_default_context()) if scheme == "https" else None
+		rv = await asyncio.open_connection(host, port, ssl=context)
+		self._info["connections"] += 1
+		return rv
+
+	@staticmethod
+	async def _readResponse(reader):
+		# answers (status, reason, headers with lowercase names, body, whether the connection can be
+		# reused)
+		line = await reader.readline()
+		if not line:
+			raise ConnectionError("connection closed")
+		version, status, reason = (line.decode("latin-1").rstrip("\r\n").split(" ", 2) + [""])[:3]
+		status = int(status)
+		headers = {}
+		while True:
+			line = await reader.readline()
+			if line in [b"\r\n", b"\n", b""]:
+				break
+			name, _, value = line.decode("latin-1").partition(":")
+			headers[name.strip().lower()] = value.strip()
+		keepAlive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+		if status in [204, 304] or status < 200:
+			body = b""
+		elif "chunked" in headers.get("transfer-encoding", "").lower():
+			chunks = []
+			while True:
+				size = int((await reader.readline()).split(b";")[0], 16)
+				if size == 0:
+					while (await reader.readline()) not in [b"\r\n", b"\n", b""]:
+						pass
+					break
+				chunks.append(await reader.readexactly(size))
+				await reader.readline()
+			body = b"".join(chunks)
+		elif "content-length" in headers:
+			body = await reader.readexactly(int(headers["content-length"]))
+		else:
+			body = await reader.read()
+			keepAlive = False
+		return status, reason, headers, body, keepAlive
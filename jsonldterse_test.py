@@ -1,6 +1,16 @@
 #! /usr/bin/env python3 --
 
-from jsonldterse import JSONLD_Terse
+from jsonldterse import JSONLD_Terse, JSONLD_TerseSnapshot
+from jsonldterse_loader import JSONLD_TerseLoader
+import asyncio
+import http.server
+import io
+import os
+import sys
+import tempfile
+import threading
+import urllib.error
+import urllib.parse
 import json
 import argparse
 
@@ -94,6 +104,7 @@ def test_example8(graph):
 	assert res["http://www.w3.org/2000/01/rdf-schema#subClassOf"][0] == graph.get("http://zenomt.com/ns/terse-api#Resource")
 	assert (item := graph.get("http://example.com/ns#Item"))
 	assert item["http://www.w3.org/2000/01/rdf-schema#subClassOf"][0] == res
+	assert graph.get("http://example.com/ns#stuff")["http://www.w3.org/1999/02/22-rdf-syntax-ns#type"][0]["@id"] == "http://www.w3.org/2000/01/rdf-schema#Property"
 
 def run_file_tests():
 	"""try the samples to make sure they don't cause a crash"""
@@ -121,6 +132,7 @@ def run_file_tests():
 			if args.verbose > 1: print(f"graph: {graph._nodes}")
 			if tester:
 				tester(graph)
+				tester(graph.compact())
 			tree_json = graph.asJSON(indent=4, noArray=True, rawLiteral=True, base=(baseUri if args.relative else None))
 			triples = graph.asTriples()
 			if args.verbose or args.json:
@@ -172,7 +184,670 @@ def test_select():
 		assert graph.select(p="http://www.w3.org/1999/02/22-rdf-syntax-ns#type", o="https://schema.org/Corporation")[0]["subject"] == graph.select(literal="Example Corp.", column="subject")[0]
 		assert len(graph.select(filter=(lambda s,p,o: o.get("@value", None) == "Mike"))) == 1
 
+def test_selectIndexes():
+	name = "api.jsonld"
+	if args.only is not None and name != args.only:
+		return
+	print("\ntest_selectIndexes api.jsonld")
+	with open(name, "r", encoding="utf-8") as f:
+		graph = JSONLD_Terse(json.load(f), documentUri="http://zenomt.com/ns/terse-api")
+	def same(**kwargs):
+		# passing nodes bypasses the indexes, so the answers must be identical
+		indexed = graph.select(**kwargs)
+		assert indexed == graph.select(nodes=graph.nodes, **kwargs)
+		return indexed
+	RDF_TYPE = "http://www.w3.org/1999/02/22-rdf-syntax-ns#type"
+	assert len(same(p=RDF_TYPE, o="http://www.w3.org/2000/01/rdf-schema#Class")) > 1
+	assert len(same(o="http://zenomt.com/ns/terse-api#Resource")) > 1
+	assert len(same(p="http://www.w3.org/2000/01/rdf-schema#domain")) > 1
+	assert len(same(literal="The first page of a paged resource.")) == 1
+	assert len(same(p="http://www.w3.org/2000/01/rdf-schema#comment", literal={"@value": "The first page of a paged resource."})) == 1
+	assert len(same(p=RDF_TYPE, literal="The first page of a paged resource.")) == 0
+	assert len(same(p=RDF_TYPE, o="http://zenomt.com/ns/terse-api#notfound")) == 0
+	for node in graph.nodes:
+		if "@id" in node:
+			same(o=node)
+			same(p=node)
+
+def test_mergeStream():
+	print("\ntest_mergeStream")
+	for name in ["example.jsonld", "example3.jsonld", "example4.jsonld", "example6.jsonld", "api.jsonld"]:
+		if args.only is not None and name != args.only:
+			continue
+		with open(name, "rb") as f:
+			raw = f.read()
+		expected = JSONLD_Terse(json.loads(raw), documentUri="https://example.com/" + name)
+		for chunkSize in [1, 5, 4096]:
+			for fp in [io.BytesIO(raw), io.StringIO(raw.decode("utf-8"))]:
+				graph = JSONLD_Terse()
+				graph.root = graph.mergeStream(fp, documentUri="https://example.com/" + name, chunkSize=chunkSize)
+				assert graph.asJSON() == expected.asJSON()
+				assert graph.asTriples() == expected.asTriples()
+	graph = JSONLD_Terse()
+	assert len(graph.mergeStream(io.StringIO('[{"@id": "urn:a", "urn:p": [1, 2.5, [true, null]]}, {"@id": "urn:b"}]'))) == 2
+	assert graph.get("urn:a")["urn:p"][1]["@value"] == 2.5
+	assert graph.get("urn:a")["urn:p"][2][0]["@value"] is True
+	# top-level value and list objects are merged as merge would, not as nodes
+	for text in ['{"@value": 5}', '{"@type": "urn:t", "@value": "5"}', '{"@context": {"t": "urn:t"}, "@type": "t", "@value": "5"}']:
+		streamed = JSONLD_Terse().mergeStream(io.StringIO(text))
+		merged = JSONLD_Terse().merge(json.loads(text))
+		assert streamed == merged and "@value" in streamed
+	streamed = graph.mergeStream(io.StringIO('{"@list": [1, {"@id": "urn:a"}]}'))
+	assert streamed["@list"][0]["@value"] == 1 and streamed["@list"][1] is graph.get("urn:a")
+	# an empty array member adds its key, and array members' values are added once they've all been merged, as in merge
+	text = '{"@id": "urn:a", "urn:s": [], "urn:p": [{"@id": "urn:a", "urn:s": 1, "urn:q": 2}], "urn:r": [1, {"@id": "urn:a", "urn:t": 3}]}'
+	for chunkSize in [1, 4096]:
+		streamed = JSONLD_Terse()
+		streamed.mergeStream(io.StringIO(text), chunkSize=chunkSize)
+		assert streamed.asJSON() == JSONLD_Terse(json.loads(text)).asJSON()
+		assert list(streamed.get("urn:a").keys()) == ["@id", "urn:s", "urn:q", "urn:p", "urn:t", "urn:r"]
+	try:
+		graph.mergeStream(io.StringIO('{"urn:p": 1, "@context": {}}'))
+		assert False
+	except ValueError as e:
+		assert "@context" in str(e)
+	try:
+		graph.mergeStream(io.StringIO('{"urn:p": [1, 2'))
+		assert False
+	except json.JSONDecodeError:
+		pass
+
+def test_writeNTriples():
+	print("\ntest_writeNTriples")
+	for name in ["example.jsonld", "example3.jsonld"]:
+		if args.only is not None and name != args.only:
+			continue
+		with open(name, "r", encoding="utf-8") as f:
+			graph = JSONLD_Terse(json.load(f), documentUri="https://example.com/" + name)
+		out = io.StringIO()
+		count = graph.writeNTriples(out, bufferSize=64)
+		lines = out.getvalue().splitlines()
+		assert count == len(lines)
+		if name == "example.jsonld":
+			triples = graph.asTriples()
+			assert [l.split(" ")[0] for l in lines] == [("<" + t["subject"] + ">" if t["subject"][:2] != "_:" else t["subject"]) for t in triples]
+			assert '<https://example.com/card#me> <http://xmlns.com/foaf/0.1/name> "Michael Thornburgh"@en-us .' in lines
+		else:
+			# three list cells, each with rdf:first and rdf:rest
+			assert count == len(graph.asTriples()) + 6
+			assert '<https://example.com/example3.jsonld#test> <http://example.com/ns#primitives> "-4"^^<http://www.w3.org/2001/XMLSchema#integer> .' in lines
+
+def test_snapshot():
+	print("\ntest_snapshot")
+	for name in ["example.jsonld", "example3.jsonld", "api.jsonld"]:
+		if args.only is not None and name != args.only:
+			continue
+		with open(name, "r", encoding="utf-8") as f:
+			graph = JSONLD_Terse(json.load(f), documentUri="https://example.com/" + name)
+		with tempfile.TemporaryDirectory() as directory:
+			path = os.path.join(directory, "graph.snapshot")
+			with open(path, "wb") as f:
+				graph.writeSnapshot(f)
+			snapshot = JSONLD_TerseSnapshot(path)
+			node = graph.nodes[-1]
+			if "@id" in node:
+				assert snapshot.get(node["@id"])["@id"] == node["@id"]
+				assert len(snapshot._nodeCache) < len(graph.nodes)
+			assert snapshot.get("urn:not-in-graph") is None
+			assert snapshot.asTriples() == graph.asTriples()
+			assert snapshot.asJSON() == graph.asJSON()
+			for predicate in graph._subjectsByPredicate:
+				assert [each["subject"].get("@id") for each in snapshot.select(p=predicate)] == [each["subject"].get("@id") for each in graph.select(p=predicate)]
+			if name == "example.jsonld":
+				me = snapshot.get("https://example.com/card#me")
+				assert snapshot.select(literal="Mike", column="subject") == [me]
+				assert [each.get("@id") for each in snapshot.select(o=me, column="subject")] == [each.get("@id") for each in graph.select(o=me["@id"], column="subject")]
+			try:
+				snapshot.merge({ "@id": "urn:x", "urn:p": 1 })
+				assert False
+			except TypeError:
+				pass
+			snapshot.close()
+	# empty value lists, and literal attributes that aren't strings
+	graph = JSONLD_Terse({ "@id": "urn:x", "urn:empty": [], "urn:p": [ { "@value": "x", "@language": ["en"] }, { "@value": 1, "@direction": { "d": 1 } } ], "urn:q": { "@id": "urn:y", "urn:empty": [] } })
+	with tempfile.TemporaryDirectory() as directory:
+		path = os.path.join(directory, "graph.snapshot")
+		with open(path, "wb") as f:
+			graph.writeSnapshot(f)
+		snapshot = JSONLD_TerseSnapshot(path)
+		assert snapshot.asJSON() == graph.asJSON() and snapshot.asTriples() == graph.asTriples()
+		assert snapshot.get("urn:y")["urn:empty"] == () and snapshot.select(literal=1, column="subject") == [snapshot.root]
+		snapshot.close()
+
+def test_writeJSON():
+	print("\ntest_writeJSON")
+	for name in ["example.jsonld", "example3.jsonld", "example6.jsonld", "example8.jsonld"]:
+		if args.only is not None and name != args.only:
+			continue
+		with open(name, "r", encoding="utf-8") as f:
+			graph = JSONLD_Terse(json.load(f), documentUri="https://example.com/" + name)
+		for options in [{}, dict(indent=2, noArray=True), dict(separators=(",", ":"), base="https://example.com/" + name, rawLiteral=True)]:
+			out = io.StringIO()
+			graph.writeJSON(out, bufferSize=64, **options)
+			assert out.getvalue() == graph.asJSON(**options)
+
+	# blank nodes referenced again are given an @id where asTree gives them one, which can be
+	# after members that have already been written
+	graph = JSONLD_Terse({
+		"@context": { "ex": "http://example.com/ns#" },
+		"ex:p": [ { "@id": "_:b", "ex:q": 1 }, { "@id": "_:b" } ],
+		"ex:r": { "@id": "_:a", "ex:s": { "@id": "_:c", "ex:t": { "@id": "_:a" } }, "ex:u": { "@id": "_:c" } },
+		"@included": [ { "@id": "ex:x", "ex:v": { "@id": "_:d", "ex:w": { "@list": [ { "@id": "_:d" } ] } } } ]
+	})
+	for indent in [None, 2]:
+		out = io.StringIO()
+		graph.writeJSON(out, indent=indent)
+		assert out.getvalue() == graph.asJSON(indent=indent)
+
+	# deeper than json.dumps can go
+	doc = { "@id": "#end" }
+	for i in range(sys.getrecursionlimit() * 2):
+		doc = { "ex:next": doc }
+	graph = JSONLD_Terse(dict(doc, **{ "@context": { "ex": "http://example.com/ns#" } }), documentUri="https://example.com/doc", maxDepth=sys.getrecursionlimit() * 2 + 2)
+	out = io.StringIO()
+	graph.writeJSON(out, noArray=True, separators=(",", ":"))
+	assert out.getvalue() == '{"http://example.com/ns#next":' * (sys.getrecursionlimit() * 2) + '{"@id":"https://example.com/doc#end"}' + "}" * (sys.getrecursionlimit() * 2)
+
+def test_compaction():
+	if args.only is not None:
+		return
+	print("\ntest_compaction")
+	documentUri = "https://example.com/things/list"
+	doc = {
+		"@context": { "ex": "http://example.com/ns#", "xsd": "http://www.w3.org/2001/XMLSchema#", "@vocab": "http://example.com/vocab#" },
+		"@id": "",
+		"@type": "ex:List",
+		"title": "things",
+		"ex:item": [ { "@id": "one", "ex:when": { "@value": "2024-01-01", "@type": "xsd:date" } }, { "@id": "./#two", "ex:data": { "@value": { "a": 1 }, "@type": "@json" } } ]
+	}
+	graph = JSONLD_Terse(doc, documentUri=documentUri)
+	context = { "ex": "http://example.com/ns#", "xsd": "http://www.w3.org/2001/XMLSchema#", "@vocab": "http://example.com/vocab#", "@base": "https://example.org/" }
+	tree = graph.asTree(base=documentUri, noArray=True, rawLiteral=True, context=context)
+	assert list(tree.keys()) == ["@context", "@id", "@type", "title", "ex:item"]
+	assert tree["@context"] == { "ex": "http://example.com/ns#", "xsd": "http://www.w3.org/2001/XMLSchema#", "@vocab": "http://example.com/vocab#" }
+	assert tree["@id"] == "" and tree["@type"] == "ex:List" and tree["title"] == "things"
+	assert tree["ex:item"][0] == { "@id": "one", "ex:when": { "@value": "2024-01-01", "@type": "xsd:date" } }
+	assert tree["ex:item"][1] == { "@id": "./#two", "ex:data": { "@value": { "a": 1 }, "@type": "@json" } }
+	assert JSONLD_Terse(tree, documentUri=documentUri).asTriples() == graph.asTriples()
+
+	out = io.StringIO()
+	graph.writeJSON(out, base=documentUri, context=True)
+	assert out.getvalue() == graph.asJSON(base=documentUri, context=True)
+	assert json.loads(out.getvalue())["@context"] == graph.inferContext() == { "ns": "http://example.com/ns#" }
+
+def test_cacheInfo():
+	print("\ntest_cacheInfo")
+	doc = {
+		"@context": { "ex": "http://example.com/ns#", "@vocab": "http://example.com/vocab#" },
+		"@id": "http://example.com/c/",
+		"ex:member": [ { "@id": str(i), "@type": "ex:Item", "ex:name": f"item {i}", "plain": i } for i in range(50) ],
+		"@included": [ { "@context": { "ex": "http://example.com/other#" }, "@id": "x", "ex:name": "other" } ] * 2
+	}
+	graph = JSONLD_Terse(doc, documentUri="http://example.com/c/", cacheSize=16)
+	info = graph.cacheInfo()
+	assert info["uris"].hits > 100 and info["uris"].maxsize == 16
+	assert info["contexts"].misses == 2 and info["contexts"].hits == 1
+	assert graph.get("http://example.com/c/7")["http://example.com/vocab#plain"][0]["@value"] == 7
+	assert graph.get("http://example.com/c/x")["http://example.com/other#name"][0]["@value"] == "other"
+	uncached = JSONLD_Terse(doc, documentUri="http://example.com/c/", cacheSize=0)
+	assert uncached.cacheInfo()["uris"].hits == 0
+	assert uncached.asJSON() == graph.asJSON()
+
+def test_mergeDocuments():
+	print("\ntest_mergeDocuments")
+	documents = []
+	for name in ["example.jsonld", "example3.jsonld", "example4.jsonld", "example5.jsonld", "example6.jsonld", "example.jsonld"]:
+		with open(name, "r", encoding="utf-8") as f:
+			documents.append((f.read(), "https://zenomt.github.io/jsonld-terse/" + name))
+	documents.append(({ "@id": "https://zenomt.github.io/jsonld-terse/card#me", "http://xmlns.com/foaf/0.1/nick": ["Mike", "zenomt"] }, None))
+	documents.append(("[1, 2]", None))
+	sequential = JSONLD_Terse()
+	expectedRoots = [sequential.merge(json.loads(source) if type(source) == str else source, documentUri=documentUri) for source, documentUri in documents]
+	graph = JSONLD_Terse()
+	roots = graph.mergeDocuments(documents, processes=2)
+	assert graph.asJSON() == sequential.asJSON()
+	assert graph.asTriples() == sequential.asTriples()
+	assert len(roots) == len(expectedRoots)
+	assert roots[0] is graph.get("https://zenomt.github.io/jsonld-terse/card#me")
+	assert roots[-1][1]["@value"] == 2
+	assert len(graph.select(s="https://zenomt.github.io/jsonld-terse/card#me", p="http://xmlns.com/foaf/0.1/nick")) == 2
+
+def test_literalInterning():
+	if args.only is not None:
+		return
+	print("\ntest_literalInterning")
+	graph = JSONLD_Terse({
+		"@context": { "ex": "http://example.com/ns#", "xsd": "http://www.w3.org/2001/XMLSchema#" },
+		"@id": "ex:a",
+		"ex:p": [ 1, 1.0, True, -0.0, 0.0, "x", { "@value": "x" }, { "@value": "x", "@direction": "rtl" }, { "@value": "x", "@language": "en" }, { "@value": { "b": 1, "a": 2 }, "@type": "@json" } ],
+		"ex:q": [ { "@value": "1", "@type": "xsd:integer" }, { "@value": "x", "@language": "en" }, { "@value": { "a": 2, "b": 1 }, "@type": "@json" } ]
+	})
+	a = graph.get("http://example.com/ns#a")
+	p = a["http://example.com/ns#p"]
+	q = a["http://example.com/ns#q"]
+	assert len(p) == 9
+	assert [each["@value"] for each in p[:3]] == [1, 1.0, True] and [type(each["@value"]) for each in p[:3]] == [int, float, bool]
+	assert str(p[3]["@value"]) == "-0.0" and str(p[4]["@value"]) == "0.0"
+	assert p[6]["@direction"] == "rtl"
+	assert q[0]["@type"] == "http://www.w3.org/2001/XMLSchema#integer"
+	assert q[1] is p[7] and q[2] is p[8]
+
+def test_deepDocuments():
+	if args.only is not None:
+		return
+	print("\ntest_deepDocuments")
+	depth = sys.getrecursionlimit() * 2
+	doc = { "@id": "#end" }
+	for i in range(depth):
+		doc = { "ex:next": doc }
+	doc = dict(doc, **{ "@context": { "ex": "http://example.com/ns#" }, "@id": "#start" })
+	try:
+		JSONLD_Terse(doc, documentUri="https://example.com/doc")
+		assert False
+	except RecursionError:
+		pass
+	graph = JSONLD_Terse(doc, documentUri="https://example.com/doc", maxDepth=depth + 2)
+	assert len(graph.nodes) == depth + 2
+	tree = graph.asTree(noArray=True)
+	for i in range(depth):
+		tree = tree["http://example.com/ns#next"]
+	assert tree == { "@id": "https://example.com/doc#end" }
+
+	# a cycle through blank nodes names the blank node when it's first referenced again
+	graph = JSONLD_Terse({ "@context": { "ex": "http://example.com/ns#" }, "@id": "_:a", "ex:p": { "@id": "_:b", "ex:q": { "@id": "_:a" } }, "ex:r": 1 })
+	assert graph.asJSON() == '{"@id": "_:b0", "http://example.com/ns#p": [{"http://example.com/ns#q": [{"@id": "_:b0"}]}], "http://example.com/ns#r": [{"@value": 1}]}'
+
+def test_compact():
+	name = "example.jsonld"
+	if args.only is not None and name != args.only:
+		return
+	print("\ntest_compact example.jsonld")
+	with open(name, "r", encoding="utf-8") as f:
+		graph = JSONLD_Terse(json.load(f), documentUri="https://zenomt.github.io/jsonld-terse/example.jsonld")
+	compact = graph.compact()
+	assert compact.asJSON() == graph.asJSON()
+	assert compact.asTriples() == graph.asTriples()
+	me = compact.get("https://zenomt.github.io/jsonld-terse/card#me")
+	assert compact.root is me and compact.get(me) is me and compact.get({ "@id": me["@id"] }) is me
+	assert compact.select(literal="Mike", column="subject") == [me]
+	assert len(compact.select(p="http://www.w3.org/1999/02/22-rdf-syntax-ns#type")) == 4
+	assert compact.select(p="http://www.w3.org/1999/02/22-rdf-syntax-ns#type", o="https://schema.org/Corporation")[0]["subject"]["https://schema.org/name"][0]["@value"] == "Example Corp."
+	# literals whose key isn't hashable are interned by their JSON, as when merged
+	odd = JSONLD_Terse({ "@id": "urn:x", "urn:p": [ { "@value": "x", "@language": ["en"] }, { "@value": "x", "@language": ["en"] }, { "@value": "y", "@direction": { "d": 1 } } ] })
+	assert odd.compact().asJSON() == odd.asJSON() and len(odd.compact()._literals) == 2
+	try:
+		compact.merge({ "@id": "urn:x", "urn:p": 1 })
+		assert False
+	except TypeError:
+		pass
+
+def test_patch():
+	name = "api.md"
+	if args.only is not None and name != args.only:
+		return
+	print("\ntest_patch api.md PATCH example")
+	graph = JSONLD_Terse({
+		"@context": { "foaf": "http://xmlns.com/foaf/0.1/", "ex": "http://example.com/ns#" },
+		"@id": "",
+		"@type": "foaf:PersonalProfileDocument",
+		"foaf:primaryTopic": {
+			"@id": "#me",
+			"@type": "foaf:Person",
+			"foaf:name": "Michael Thornburgh",
+			"foaf:nick": [ "Mike", "zenomt" ],
+			"ex:extras": { "@id": "#extra", "@type": "ex:Extras", "ex:comment": "Some Extras" },
+			"ex:list": { "@list": [ { "@id": "#listed" }, "listed literal" ] }
+		}
+	}, documentUri="https://mike.example.com/card")
+	graph.patch({
+		"@context": { "api": "http://zenomt.com/ns/terse-api#", "foaf": "http://xmlns.com/foaf/0.1/", "schema": "https://schema.org/", "ex": "http://example.com/ns#" },
+		"@remove": [
+			{ "@id": "#me", "foaf:nick": "zenomt", "ex:extras": { "@id": "api:any" }, "ex:list": { "@id": "api:any" } },
+			{ "@id": "#extra", "api:any": { "@id": "api:any" } }
+		],
+		"@id": "#me",
+		"@type": "schema:Person"
+	}, documentUri="https://mike.example.com/card")
+	result = graph.asTree(base="https://mike.example.com/card", noArray=True, rawLiteral=True)
+	if args.verbose: print(json.dumps(result, indent=4))
+	me = result["http://xmlns.com/foaf/0.1/primaryTopic"]
+	assert me["http://www.w3.org/1999/02/22-rdf-syntax-ns#type"] == [ { "@id": "http://xmlns.com/foaf/0.1/Person" }, { "@id": "https://schema.org/Person" } ]
+	assert me["http://xmlns.com/foaf/0.1/nick"] == "Mike"
+	assert "http://example.com/ns#extras" not in me and "http://example.com/ns#list" not in me
+	for uri in [ "https://mike.example.com/card#extra", "https://mike.example.com/card#listed", "http://example.com/ns#Extras", "http://example.com/ns#extras" ]:
+		assert graph.get(uri) is None
+	assert graph.select(literal="zenomt") == [] and graph.select(literal="listed literal") == []
+	assert len(graph.nodes) == len(JSONLD_Terse(graph.asTree()).nodes)
+
+	# wildcard subjects and objects, counting the triples removed
+	assert graph.remove({ "@id": "http://zenomt.com/ns/terse-api#any", "http://xmlns.com/foaf/0.1/name": { "@id": "http://zenomt.com/ns/terse-api#any" } }) == 1
+	assert graph.remove({ "@id": "http://zenomt.com/ns/terse-api#any", "@type": "https://schema.org/Person" }) == 1
+	assert graph.remove({ "@id": "https://mike.example.com/card#nobody", "http://zenomt.com/ns/terse-api#any": "Mike" }) == 0
+	assert graph.select(p="http://www.w3.org/1999/02/22-rdf-syntax-ns#type", o="https://schema.org/Person") == []
+	assert graph.get("https://schema.org/Person") is None and graph.select(literal="Michael Thornburgh") == []
+	assert len(graph.asTriples()) == 4
+	try:
+		graph.compact().patch({ "@remove": { "@id": "urn:x", "urn:p": 1 } })
+		assert False
+	except TypeError:
+		pass
+
+def test_provenance():
+	name = "api.md"
+	if args.only is not None and name != args.only:
+		return
+	print("\ntest_provenance replace and retract")
+	context = { "api": "http://zenomt.com/ns/terse-api#", "ex": "http://example.com/ns#" }
+	first = { "@context": context, "@id": "", "@type": "api:Container", "api:member": [
+		{ "@id": "1", "ex:name": "one", "ex:tags": { "@list": [ "a", { "@id": "#tag" } ] } },
+		{ "@id": "2", "ex:name": "two" } ] }
+	second = { "@context": context, "@id": "2", "ex:name": "two", "ex:comment": "shared with first" }
+	secondEdited = { "@context": context, "@id": "2", "ex:comment": "edited", "ex:related": { "@id": "3", "ex:name": "three" } }
+	uris = [ "https://example.com/c/", "https://example.com/c/2" ]
+
+	def triples(graph):
+		fp = io.StringIO()
+		graph.writeNTriples(fp)
+		return sorted(fp.getvalue().splitlines())
+
+	def rebuilt(*documents):
+		rv = JSONLD_Terse()
+		for doc, documentUri in documents:
+			rv.merge(doc, documentUri=documentUri)
+		return triples(rv)
+
+	graph = JSONLD_Terse(first, documentUri=uris[0], provenance=True)
+	graph.merge(second, documentUri=uris[1])
+	assert graph.documents == uris
+	assert triples(graph) == rebuilt((first, uris[0]), (second, uris[1]))
+
+	# the name of 2 was asserted by both, so it stays
+	graph.retract(uris[0])
+	assert graph.documents == [ uris[1] ]
+	assert triples(graph) == rebuilt((second, uris[1]))
+	assert graph.get("https://example.com/c/1") is None and graph.get("https://example.com/c/#tag") is None
+	assert graph.select(literal="a") == [] and graph.select(literal="one") == []
+
+	graph.merge(first, documentUri=uris[0])
+	node = graph.get("https://example.com/c/2")
+	graph.replace(secondEdited, documentUri=uris[1])
+	assert triples(graph) == rebuilt((first, uris[0]), (secondEdited, uris[1]))
+	assert graph.get("https://example.com/c/2") is node
+	assert graph.select(literal="shared with first") == []
+
+	# triples removed some other way are no longer any document's
+	assert graph.remove({ "@id": "https://example.com/c/2", "http://example.com/ns#name": "two" }) == 1
+	assert graph.retract(uris[0]) == 5
+	assert graph.documents == [ uris[1] ]
+	assert triples(graph) == rebuilt((secondEdited, uris[1]))
+	assert graph.retract(uris[1]) == 3 and graph.documents == [] and graph.asTriples() == []
+
+	# a node only in another document's list is kept until that list is retracted
+	graph = JSONLD_Terse(provenance=True)
+	graph.merge({ "@id": "urn:a", "urn:p": { "@id": "urn:x", "urn:q": 1 } }, documentUri="urn:d1")
+	graph.merge({ "@id": "urn:b", "urn:list": { "@list": [ [ { "@id": "urn:x" } ] ] } }, documentUri="urn:d2")
+	graph.retract("urn:d1")
+	assert graph.get("urn:x") is not None and graph.get("urn:a") is None
+	graph.retract("urn:d2")
+	assert graph.get("urn:x") is None and graph._listMembers == {}
+
+	for each in [ JSONLD_Terse(first), graph.compact() ]:
+		try:
+			each.retract(uris[0])
+			assert False
+		except TypeError:
+			pass
+
+def test_query():
+	name = "api.md"
+	if args.only is not None and name != args.only:
+		return
+	print("\ntest_query basic graph patterns")
+	ex = "http://example.com/ns#"
+	rdfType = "http://www.w3.org/1999/02/22-rdf-syntax-ns#type"
+	member = "http://zenomt.com/ns/terse-api#member"
+	graph = JSONLD_Terse({
+		"@context": { "api": "http://zenomt.com/ns/terse-api#", "ex": ex },
+		"@id": "",
+		"@type": "api:Container",
+		"api:member": [ { "@id": str(i), "@type": "ex:Special" if i % 3 == 0 else "ex:Item", "ex:name": f"item {i}", "ex:rank": i % 4, "ex:next": { "@id": str(i + 1) } } for i in range(12) ]
+	}, documentUri="https://example.com/c/")
+	container = "https://example.com/c/"
+
+	def ids(bindings, variable):
+		return sorted(each[variable]["@id"].rpartition("/")[2] for each in bindings)
+
+	for each in [ graph, graph.compact() ]:
+		result = each.query([ (container, member, "?m"), ("?m", rdfType, ex + "Special"), ("?m", ex + "rank", 1) ])
+		assert iter(result) is result
+		assert ids(result, "?m") == [ "9" ]
+		result = list(each.query([ ("?m", ex + "next", "?n"), ("?n", rdfType, "?t"), ("?m", rdfType, "?t") ]))
+		assert ids(result, "?m") == [ "1", "10", "4", "7" ] and all(each["?t"]["@id"] == ex + "Item" for each in result)
+		assert ids(each.query([ ("?m", ex + "rank", "?k"), ("?other", ex + "rank", "?k"), ("?other", ex + "name", { "@value": "item 2" }) ]), "?m") == [ "10", "2", "6" ]
+		assert ids(each.query([ ("?m", "?p", "?o", lambda s, p, o: "@value" in o and o["@value"] == 3) ]), "?m") == [ "11", "3", "7" ]
+		assert ids(each.query([ ("?m", ex + "next", "?n") ], { "?n": each.get("https://example.com/c/5") }), "?m") == [ "4" ]
+		assert list(each.query([ ("?m", ex + "rank", 9) ])) == [] and list(each.query([ ("?m", ex + "nothing", "?o") ])) == []
+		assert len(list(each.query([ ("?a", rdfType, "?t"), ("?b", rdfType, "?t") ]))) == 4 * 4 + 8 * 8 + 1
+	# a blank node as a constant predicate matches nothing
+	graph.merge({ "@id": container, ex + "blank": { ex + "name": "blank" } })
+	blank = graph.root[ex + "blank"][0]
+	assert list(graph.query([ ("?s", blank, "?o") ])) == list(graph.query([ (container, blank, "?o") ])) == list(graph.query([ ("?s", blank, 1) ])) == []
+	try:
+		graph.query([ ("?s", "?p") ])
+		assert False
+	except ValueError:
+		pass
+
+def test_pager():
+	name = "api.md"
+	if args.only is not None and name != args.only:
+		return
+	print("\ntest_pager api.md paged container")
+	doc = {
+		"@context": { "api": "http://zenomt.com/ns/terse-api#", "ex": "http://example.com/ns#" },
+		"@id": ".",
+		"@type": "api:Container",
+		"api:containerOf": { "@id": "ex:Item" },
+		"api:member": [ { "@id": str(i), "@type": "ex:Item", "ex:name": f"example item {i}", "ex:container": { "@id": "." } } for i in range(10) ],
+		"ex:usefulInfo": { "@id": ".#info", "ex:comment": "I can safely appear in each page." },
+		"ex:blankInfo": { "ex:comment": "I only appear in the first page." }
+	}
+	graph = JSONLD_Terse(doc, documentUri="https://example.com/api/items/")
+	pager = graph.pager(pageSize=4, context=doc["@context"], noArray=True, rawLiteral=True)
+	assert len(pager) == 3
+	page = pager.page(1)
+	if args.verbose:
+		print(json.dumps(page, indent=4))
+	assert list(page.keys())[:3] == [ "@context", "@metadata", "@id" ]
+	assert page["@metadata"] == { "@id": "", "@type": "api:Page", "api:pageOf": { "@id": ".", "api:firstPage": { "@id": "." }, "api:lastPage": { "@id": "page3" } }, "api:prevPage": { "@id": "." }, "api:nextPage": { "@id": "page3" } }
+	assert [each["@id"] for each in page["api:member"]] == [ "4", "5", "6", "7" ]
+	assert page["api:member"][0]["ex:container"] == { "@id": "." }
+	assert "ex:usefulInfo" in page and "ex:blankInfo" not in page and "ex:blankInfo" in pager.page(0)
+	assert "api:prevPage" not in pager.page(0)["@metadata"] and "api:nextPage" not in pager.page(2)["@metadata"]
+	try:
+		pager.page(3)
+		assert False
+	except IndexError:
+		pass
+
+	# the merge of the pages is the graph
+	merged = JSONLD_Terse()
+	for k in range(len(pager)):
+		merged.merge(json.loads(pager.pageJSON(k)), documentUri=pager.pageUri(k))
+	out = io.StringIO()
+	merged.writeNTriples(out)
+	expected = io.StringIO()
+	graph.writeNTriples(expected)
+	assert sorted(out.getvalue().splitlines()) == sorted(expected.getvalue().splitlines())
+
+	# pages of about pageBytes characters, each with at least one member
+	pager = graph.compact().pager(pageBytes=400, base=None)
+	sizes = [len(pager.page(k)["http://zenomt.com/ns/terse-api#member"]) for k in range(len(pager))]
+	assert sum(sizes) == 10 and min(sizes) >= 1 and len(pager) > 1
+	assert pager.page(0)["@metadata"]["@id"] == "https://example.com/api/items/"
+
+	# pages of a container whose URI doesn't end in "/" aren't its siblings
+	doc["@id"] = ""
+	other = JSONLD_Terse(doc, documentUri="https://example.com/api/items")
+	assert [other.pager(pageSize=4).pageUri(k) for k in range(3)] == [ "https://example.com/api/items", "https://example.com/api/items?page=2", "https://example.com/api/items?page=3" ]
+	other = JSONLD_Terse(doc, documentUri="https://example.com/api/items?sort=name")
+	assert other.pager(pageSize=4).pageUri(1) == "https://example.com/api/items?sort=name&page=2"
+	doc["@id"] = "#list"
+	other = JSONLD_Terse(doc, documentUri="https://example.com/api/items")
+	pager = other.pager(pageSize=4)
+	assert [pager.pageUri(k) for k in range(3)] == [ "https://example.com/api/items#list", "https://example.com/api/items?page=2#list", "https://example.com/api/items?page=3#list" ]
+	merged = JSONLD_Terse()
+	for k in range(len(pager)):
+		merged.merge(json.loads(pager.pageJSON(k)), documentUri=urllib.parse.urldefrag(pager.pageUri(k))[0])
+	assert sorted(map(str, merged.asTriples())) == sorted(map(str, other.asTriples()))
+
+def test_instrument():
+	name = "example3.jsonld"
+	if args.only is not None and name != args.only:
+		return
+	print("\ntest_instrument example3.jsonld")
+	with open(name, "r", encoding="utf-8") as f:
+		doc = json.load(f)
+	graph = JSONLD_Terse()
+	assert graph.phaseInfo() == {}
+	graph.instrument()
+	graph.merge(doc, documentUri="https://example.com/example3.jsonld")
+	phases = graph.phaseInfo()
+	if args.verbose: print(phases)
+	assert graph.cacheInfo()["uris"].misses > 0
+	assert phases["merge"].calls == 1 and phases["rendering"].calls == 0
+	assert all(map(lambda phase: phases[phase].calls > 0 and phases[phase].seconds <= phases["merge"].seconds, ["contexts", "uris", "literals", "dedup"]))
+	graph.asJSON()
+	graph.writeNTriples(io.StringIO())
+	assert graph.phaseInfo()["rendering"].calls >= 2
+	instrumented = graph.asTriples()
+	graph.instrument(False)
+	assert graph.phaseInfo() == {} and "_basicMerge" not in vars(graph)
+	assert graph.asTriples() == instrumented == JSONLD_Terse(doc, documentUri="https://example.com/example3.jsonld").asTriples()
+	assert graph.cacheInfo()["uris"].hits > 0
+
+class PagedHandler(http.server.BaseHTTPRequestHandler):
+	# serves the pages of the server's pager at its container's path and "pageN", with ETags
+	protocol_version = "HTTP/1.1"
+	disable_nagle_algorithm = True
+
+	def setup(self):
+		super().setup()
+		self.server.connections += 1
+
+	def do_GET(self):
+		pager = self.server.pager
+		path = urllib.parse.urlsplit(pager.pageUri(0)).path
+		k = 0 if self.path == path else int(self.path[len(path) + 4:]) - 1 if self.path.startswith(path + "page") else -1
+		if not 0 <= k < len(pager):
+			self.send_response(404)
+			self.send_header("Content-Length", "0")
+			self.end_headers()
+			return
+		if self.server.garbage.get(k, 0) > 0:
+			# a page that isn't JSON, the next garbage[k] times it's fetched
+			self.server.garbage[k] -= 1
+			self.send_response(200)
+			self.send_header("Content-Length", "7")
+			self.end_headers()
+			self.wfile.write(b"garbage")
+			return
+		etag = f'"{k}"'
+		if self.headers.get("If-None-Match", None) == etag:
+			self.send_response(304)
+			self.send_header("ETag", etag)
+			self.end_headers()
+			return
+		body = pager.pageJSON(k).encode("utf-8")
+		self.send_response(200)
+		self.send_header("Content-Type", "application/ld+json")
+		self.send_header("Content-Length", str(len(body)))
+		self.send_header("ETag", etag)
+		self.end_headers()
+		self.wfile.write(body)
+
+	def log_message(self, *args):
+		pass
+
+def test_loader():
+	name = "api.md"
+	if args.only is not None and name != args.only:
+		return
+	print("\ntest_loader api.md paged container")
+	server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), PagedHandler)
+	server.daemon_threads = True
+	server.connections = 0
+	server.garbage = {}
+	container = f"http://127.0.0.1:{server.server_address[1]}/api/items/"
+	doc = {
+		"@context": { "api": "http://zenomt.com/ns/terse-api#", "ex": "http://example.com/ns#" },
+		"@id": ".",
+		"@type": "api:Container",
+		"api:member": [ { "@id": str(i), "@type": "ex:Item", "ex:name": f"example item {i}" } for i in range(50) ],
+		"ex:usefulInfo": { "@id": ".#info", "ex:comment": "I can safely appear in each page." }
+	}
+	graph = JSONLD_Terse(doc, documentUri=container)
+	server.pager = graph.pager(pageSize=6)
+	thread = threading.Thread(target=server.serve_forever, daemon=True)
+	thread.start()
+	def triples(graph):
+		out = io.StringIO()
+		graph.writeNTriples(out)
+		return sorted(out.getvalue().splitlines())
+	async def load(**kwargs):
+		async with JSONLD_TerseLoader(**kwargs) as loader:
+			loaded = await loader.load(container)
+			info = loader.loadInfo()
+			again = await loader.load(container)
+			return loaded, info, again, loader.loadInfo()
+	try:
+		for kwargs in [dict(connections=1, guessPages=False), dict(connections=4)]:
+			server.connections = 0
+			loaded, info, again, infoAgain = asyncio.run(load(**kwargs))
+			if args.verbose:
+				print(kwargs, info, infoAgain, server.connections)
+			assert triples(loaded) == triples(graph) == triples(again)
+			assert loaded.root["@id"] == container
+			assert info["pages"] == info["requests"] == len(server.pager)
+			assert infoAgain["notModified"] - info["notModified"] == infoAgain["pages"] - info["pages"] == len(server.pager)
+			assert server.connections <= kwargs["connections"]
+		try:
+			asyncio.run(JSONLD_TerseLoader().load(container + "missing"))
+			assert False
+		except urllib.error.HTTPError as e:
+			assert e.code == 404
+		# a guessed page that fails to parse is fetched again when it's linked, and only skipped then
+		server.garbage = { 4: 1 }
+		loaded, info, _, _ = asyncio.run(load())
+		assert triples(loaded) == triples(graph) and info["pages"] == len(server.pager) and info["requests"] == len(server.pager) + 1
+		server.garbage = { 4: 2 }
+		try:
+			asyncio.run(load())
+			assert False
+		except json.JSONDecodeError:
+			pass
+	finally:
+		server.shutdown()
+		server.server_close()
+
 if __name__ == "__main__":
 	run_file_tests()
 	test_effectiveRootContext()
 	test_select()
+	test_selectIndexes()
+	test_mergeStream()
+	test_writeNTriples()
+	test_snapshot()
+	test_writeJSON()
+	test_compaction()
+	test_cacheInfo()
+	test_instrument()
+	test_mergeDocuments()
+	test_literalInterning()
+	test_deepDocuments()
+	test_compact()
+	test_patch()
+	test_provenance()
+	test_query()
+	test_pager()
+	test_loader()